@@ -0,0 +1,324 @@
+import asyncio
+import functools
+import logging
+import time
+
+import httpx
+
+from profiles import Profile
+from governor import (
+    RateGovernor,
+    configure_governor,
+    GRAPHQL,
+    PROFILE,
+    DEFAULT_POST_RATE,
+    DEFAULT_PROFILE_RATE,
+    DEFAULT_POST_RATE_MAX,
+    DEFAULT_PROFILE_RATE_MAX
+)
+from decoding import CommentPage, decode_comment_page, decode_profile
+from sinks import RowSink
+from crawl_index import CommentDelta
+from metrics import get_stage, SCRAPE_POST, USER_PROFILE
+from utils import (
+    INSTAGRAM_GRAPHQL_URL,
+    PROFILE_INFO_URL,
+    get_shortcode,
+    UniqueUsernames,
+    build_post_query,
+    get_graphql_headers,
+    get_profile_headers,
+    create_client,
+    FetchError,
+    REQUEST_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Async fetchers
+# ---------------------------
+
+async def _request_with_retries_async(send, decode, governor: RateGovernor, metrics, what: str,
+                                     retries: int = REQUEST_RETRIES):
+    """Async counterpart of utils._request_with_retries: `send` is a coroutine function."""
+    for attempt in range(retries):
+        if attempt:
+            metrics.retry()
+        metrics.slept(await governor.acquire())
+        start = time.perf_counter()
+        try:
+            logger.debug("Attempt %d: %s", attempt + 1, what)
+            response = await send()
+        except httpx.HTTPError as e:
+            metrics.error(time.perf_counter() - start)
+            governor.record_error()
+            logger.warning("[%s] Request failed (attempt %d): %s", what, attempt + 1, e)
+            continue
+        metrics.observe(time.perf_counter() - start, response.status_code, len(response.content))
+        governor.record(response.status_code, response.headers.get("Retry-After"))
+        if response.status_code != 200:
+            logger.warning("[%s] Non-200 status code: %d", what, response.status_code)
+            continue
+        try:
+            return decode(response.content)
+        except Exception as e:
+            logger.error("[%s] Could not parse reply (attempt %d): %s", what, attempt + 1, e)
+    raise FetchError(f"{what}: no usable reply after {retries} attempts")
+
+
+async def fetch_comment_page_async(url_or_shortcode: str, client: httpx.AsyncClient,
+                                   governor: RateGovernor, retries: int = REQUEST_RETRIES,
+                                   first: int = 50, after: str = None) -> CommentPage:
+    """
+    Async version of utils.fetch_comment_page. Each attempt waits for the
+    GraphQL governor and reports the reply back to it. Raises FetchError
+    if every attempt failed.
+    """
+    shortcode = get_shortcode(url_or_shortcode)
+    body = build_post_query(shortcode, first=first, after=after)
+    return await _request_with_retries_async(
+        lambda: client.post(INSTAGRAM_GRAPHQL_URL, headers=get_graphql_headers(), content=body,
+                            timeout=60.0),
+        decode_comment_page, governor, get_stage(SCRAPE_POST),
+        f"post {shortcode} (after={after})", retries
+    )
+
+
+async def iter_comments_async(url_or_shortcode: str, client: httpx.AsyncClient,
+                              governor: RateGovernor, page_size: int = 50,
+                              max_comments: int = None, delta: CommentDelta = None):
+    """
+    Async generator counterpart of utils.iter_comments: yields Comment records
+    page by page, each page request paced by the GraphQL governor. With a
+    CommentDelta only the comments newer than the last visit are fetched.
+    Raises FetchError if a page could not be fetched.
+    """
+    after = delta.resume_from if delta else None
+    count = 0
+    while True:
+        page = await fetch_comment_page_async(url_or_shortcode, client, governor,
+                                              first=page_size, after=after)
+        if delta is not None and delta.cursor_rejected(after, page):
+            logger.warning("Saved comment cursor for %s was rejected, starting over.", url_or_shortcode)
+            delta.restart()
+            after = None
+            continue
+        more = delta.observe_page(after, page) if delta is not None else True
+        for comment in page.comments:
+            if delta is not None:
+                if not delta.is_new(comment):
+                    continue
+                delta.seen(comment)
+            yield comment
+            count += 1
+            if max_comments is not None and count >= max_comments:
+                return
+        after = page.end_cursor
+        if after is None or not more:
+            return
+
+
+async def get_user_profile_async(username: str, client: httpx.AsyncClient,
+                                 governor: RateGovernor, retries: int = REQUEST_RETRIES) -> Profile:
+    """
+    Async version of utils.get_user_profile, paced by the profile governor.
+    """
+    url = PROFILE_INFO_URL.format(username=username)
+    try:
+        return await _request_with_retries_async(
+            lambda: client.get(url, headers=get_profile_headers(), timeout=30.0),
+            lambda content: decode_profile(content, username),
+            governor, get_stage(USER_PROFILE), f"profile {username}", retries
+        )
+    except FetchError as e:
+        logger.warning("Could not fetch profile: %s", e)
+        return None
+
+# ---------------------------
+# Pipeline stages
+# ---------------------------
+
+_DONE = object()
+
+
+class _Fanout:
+    """
+    Tracks which posts each username appeared on so each profile is fetched
+    once and its row is written for every post. A user seen again while their
+    profile is in flight is attached to the pending request; a user seen after
+    it completed is written straight from the remembered contact fields.
+    With a CheckpointJournal, users finished by an earlier run count as done.
+    """
+
+    def __init__(self, sink: RowSink, journal=None):
+        self.sink = sink
+        self.journal = journal
+        self.pending = {}   # { username: [post_url, ...] } awaiting a fetch
+        self.done = {}      # { username: row fields without post_url, or None on failure }
+        self.requests_saved = 0
+
+    def add(self, post_url: str, username: str) -> bool:
+        """Register a (post, commenter) pair; return True if a fetch must be queued."""
+        if username not in self.done and self.journal and self.journal.user_done(username):
+            self.done[username] = self.journal.user_row(username)
+        if username in self.done:
+            self.requests_saved += 1
+            if self.done[username] is not None:
+                self._write([post_url], username, self.done[username])
+            return False
+        if username in self.pending:
+            self.requests_saved += 1
+            self.pending[username].append(post_url)
+            return False
+        self.pending[username] = [post_url]
+        return True
+
+    def complete(self, username: str, profile: Profile):
+        post_urls = self.pending.pop(username, [])
+        if not profile:
+            self.done[username] = None
+            logger.warning("Could not retrieve profile data for %s", username)
+            return
+        fields = profile.contact_fields()
+        self.done[username] = fields
+        on_flush = None
+        if self.journal:
+            # Journal the user only once their rows have reached the output file
+            on_flush = functools.partial(self.journal.mark_user, username, fields)
+        self._write(post_urls, username, fields, on_flush)
+        logger.debug("Wrote profile data for %s (%d posts).", username, len(post_urls))
+
+    def _write(self, post_urls: list, username: str, fields: dict, on_flush=None):
+        self.sink.write_many([{"post_url": post_url, **fields} for post_url in post_urls], on_flush)
+
+
+async def _post_worker(post_queue: asyncio.Queue, profile_queue: asyncio.Queue,
+                       client: httpx.AsyncClient, governor: RateGovernor, fanout: _Fanout,
+                       max_comments: int = None, index=None, store=None):
+    """Producer stage: stream each post's commenters into username fetch jobs."""
+    while True:
+        post_url = await post_queue.get()
+        try:
+            if post_url is _DONE:
+                return
+            journal = fanout.journal
+            done_usernames = journal.post_usernames(post_url) if journal else None
+            if done_usernames is not None:
+                # Rows for users already finished were written by the earlier run
+                for username in done_usernames:
+                    if not journal.user_done(username) and fanout.add(post_url, username):
+                        await profile_queue.put(username)
+                continue
+            seen = UniqueUsernames()  # this post's commenters
+            shortcode = get_shortcode(post_url)
+            delta = CommentDelta(index.comment_state(shortcode)) if index else None
+            try:
+                async for comment in iter_comments_async(post_url, client, governor,
+                                                         max_comments=max_comments, delta=delta):
+                    if store:
+                        store.add_comments(shortcode, (comment,))
+                    username = comment.username
+                    if seen.add(username) and fanout.add(post_url, username):
+                        await profile_queue.put(username)
+            except FetchError as e:
+                # Not journaled, so the post is scraped again by --resume or the next run
+                logger.error("Skipping %s: %s", post_url, e)
+                continue
+            if store:
+                store.add_post(shortcode, post_url, scraped=True)
+            if delta is not None and delta.previous is not None:
+                logger.debug("%d new commenters on %s since the last visit", len(seen), post_url)
+            elif not seen:
+                # Still journaled (and indexed), so the post is not scraped again until it gains comments
+                logger.warning("No commenters found for %s", post_url)
+            if journal:
+                fanout.sink.after_flush(functools.partial(
+                    journal.mark_post, post_url, list(seen), delta.state() if delta else None))
+        finally:
+            post_queue.task_done()
+
+
+async def _profile_worker(profile_queue: asyncio.Queue, fanout: _Fanout,
+                          client: httpx.AsyncClient, governor: RateGovernor, cache=None, store=None):
+    """Consumer stage: fetch each unique commenter's profile once."""
+    while True:
+        username = await profile_queue.get()
+        try:
+            if username is _DONE:
+                return
+            profile = cache.get(username) if cache else None
+            if profile is None:
+                profile = await get_user_profile_async(username, client, governor)
+                if profile and cache:
+                    cache.put(username, profile)
+            if profile and store:
+                store.add_profile(profile)
+            fanout.complete(username, profile)
+        finally:
+            profile_queue.task_done()
+
+
+async def run_pipeline(post_urls: list, cookies: dict, sink: RowSink,
+                       post_rate: float = DEFAULT_POST_RATE,
+                       profile_rate: float = DEFAULT_PROFILE_RATE,
+                       post_rate_max: float = DEFAULT_POST_RATE_MAX,
+                       profile_rate_max: float = DEFAULT_PROFILE_RATE_MAX,
+                       post_workers: int = 2, profile_workers: int = 4,
+                       max_comments: int = None, cache=None, journal=None, index=None,
+                       store=None):
+    """
+    Run post scraping and profile fetching concurrently. Profile fetching
+    starts as soon as the first post's commenters are known, and each
+    endpoint is paced only by its own RateGovernor, which starts at
+    post_rate / profile_rate and adapts between backoff on 429/5xx and the
+    *_rate_max ceilings, so total run time is roughly
+    max(posts / post_rate, users / profile_rate) or better. If a
+    ProfileCache is given, cached users are served without any request.
+
+    Rows (post_url, username, biography, phone_number, email, link) go to
+    `sink`. With a CheckpointJournal, finished posts and users are skipped.
+    With a CrawlIndex, posts visited before only fetch their new comments
+    (the new CommentStates are journaled, see main.collect_and_run).
+    With a CrawlStore, comments, profiles and contacts are recorded in it.
+
+    Returns a dict with `unique_users`, `requests_saved` by deduplication,
+    a `connections` reuse summary of the pooled client and the final
+    `governors` stats per endpoint.
+    """
+    post_governor = configure_governor(GRAPHQL, post_rate, post_rate_max)
+    profile_governor = configure_governor(PROFILE, profile_rate, profile_rate_max)
+    post_queue = asyncio.Queue()
+    # Bounded so the post stage cannot run arbitrarily far ahead of profiles.
+    profile_queue = asyncio.Queue(maxsize=profile_workers * 50)
+
+    for post_url in post_urls:
+        post_queue.put_nowait(post_url)
+    for _ in range(post_workers):
+        post_queue.put_nowait(_DONE)
+
+    fanout = _Fanout(sink, journal)
+
+    async with create_client(cookies=cookies, use_async=True) as client:
+        producers = [
+            asyncio.create_task(_post_worker(post_queue, profile_queue, client, post_governor, fanout,
+                                             max_comments, index, store))
+            for _ in range(post_workers)
+        ]
+        consumers = [
+            asyncio.create_task(_profile_worker(profile_queue, fanout, client, profile_governor, cache,
+                                                store))
+            for _ in range(profile_workers)
+        ]
+        await asyncio.gather(*producers)
+        for _ in range(profile_workers):
+            await profile_queue.put(_DONE)
+        await asyncio.gather(*consumers)
+    sink.flush()
+
+    return {
+        "unique_users": len(fanout.done),
+        "requests_saved": fanout.requests_saved,
+        "connections": client.stats.summary(),
+        "governors": {g.name: g.stats() for g in (post_governor, profile_governor)}
+    }
@@ -0,0 +1,93 @@
+"""
+Microbenchmark: contact extraction throughput on synthetic biographies.
+
+Compares the old approach (three extract_*_from_bio calls, each compiling
+its regex and rescanning the bio) with the single-pass ContactExtractor.
+
+    python benchmarks/bench_contacts.py            # 1,000,000 bios
+    python benchmarks/bench_contacts.py -n 100000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contacts import ContactExtractor  # noqa: E402
+
+WORDS = ["health", "supplements", "vitamins", "daily", "coach", "shop", "fitness",
+         "保健品", "营养", "DM", "for", "orders", "worldwide", "shipping", "🌿", "✨"]
+
+
+def make_bio(rng: random.Random) -> str:
+    parts = rng.choices(WORDS, k=rng.randint(3, 20))
+    if rng.random() < 0.3:
+        parts.append(f"+{rng.randint(1, 99)} {rng.randint(100, 999)} {rng.randint(1000, 9999)} {rng.randint(100, 9999)}")
+    if rng.random() < 0.3:
+        parts.append(f"user{rng.randint(1, 10**6)}@example.com")
+    if rng.random() < 0.3:
+        parts.append(f"https://linktr.ee/shop{rng.randint(1, 10**6)}")
+    rng.shuffle(parts)
+    return " ".join(parts)
+
+
+# The pre-engine implementation, kept verbatim for comparison
+def old_extract_phone_from_bio(bio: str) -> str:
+    phone_pattern = re.compile(r'(\+?\d[\d\s\-]{8,}\d)')
+    matches = phone_pattern.findall(bio)
+    return matches[0] if matches else ""
+
+
+def old_extract_email_from_bio(bio: str) -> str:
+    email_pattern = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+    matches = email_pattern.findall(bio)
+    return matches[0] if matches else ""
+
+
+def old_extract_link_from_bio(bio: str) -> str:
+    link_pattern = re.compile(r'https?://[^\s]+')
+    matches = link_pattern.findall(bio)
+    return matches[0] if matches else ""
+
+
+def run_old(bios):
+    for bio in bios:
+        old_extract_phone_from_bio(bio)
+        old_extract_email_from_bio(bio)
+        old_extract_link_from_bio(bio)
+
+
+def report(name: str, n: int, seconds: float):
+    print(f"{name:<28} {seconds:8.2f} s  {n / seconds:12,.0f} bios/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=1_000_000, help="number of synthetic bios")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bios = [make_bio(rng) for _ in range(args.n)]
+    extractor = ContactExtractor()
+    print(f"{args.n:,} synthetic bios, avg {sum(map(len, bios)) / args.n:.0f} chars")
+
+    start = time.perf_counter()
+    run_old(bios)
+    report("old: 3 x extract_*_from_bio", args.n, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for bio in bios:
+        extractor.first(bio)
+    report("engine: first()", args.n, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    extractor.extract_batch(bios)
+    report("engine: extract_batch()", args.n, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
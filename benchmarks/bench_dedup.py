@@ -0,0 +1,86 @@
+"""
+Microbenchmark: deduplicating the commenters of large posts.
+
+Compares the old list-based dedup (`username not in usernames`, O(n^2))
+with utils.collect_comment_usernames (UniqueUsernames, O(n)), on synthetic
+posts whose comments are streamed in pages of 50 like iter_comments does.
+
+    python benchmarks/bench_dedup.py                       # 100,000 comments
+    python benchmarks/bench_dedup.py -n 1000000 --users 200000 --skip-list
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decoding import Comment  # noqa: E402
+from utils import UniqueUsernames, collect_comment_usernames  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+def make_pages(n: int, users: int, seed: int = 0) -> list:
+    """n comments from a pool of `users` commenters, in pages of PAGE_SIZE."""
+    rng = random.Random(seed)
+    comments = [Comment(str(i), f"user{rng.randrange(users)}", "great post", 1700000000 + i)
+                for i in range(n)]
+    return [comments[i:i + PAGE_SIZE] for i in range(0, n, PAGE_SIZE)]
+
+
+# The pre-set implementation, kept verbatim for comparison
+def old_collect_comment_usernames(comments) -> list:
+    usernames = []
+    for comment in comments:
+        username = comment.username
+        if username and username not in usernames:
+            usernames.append(username)
+    return usernames
+
+
+def streamed(pages):
+    for page in pages:
+        yield from page
+
+
+def run(name: str, func, pages: list, n: int) -> list:
+    start = time.perf_counter()
+    result = func(streamed(pages))
+    seconds = time.perf_counter() - start
+    print(f"{name:<40} {seconds:9.3f} s {n / seconds:14,.0f} comments/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=100000, help="comments per post")
+    parser.add_argument("--users", type=int, default=50000, help="size of the commenter pool")
+    parser.add_argument("--posts", type=int, default=3, help="posts deduplicated across")
+    parser.add_argument("--skip-list", action="store_true", help="skip the slow list-based baseline")
+    args = parser.parse_args()
+
+    pages = make_pages(args.n, args.users)
+    print(f"{args.n:,} comments per post in pages of {PAGE_SIZE}, {args.users:,} possible commenters")
+
+    expected = run("set: collect_comment_usernames", collect_comment_usernames, pages, args.n)
+    if not args.skip_list:
+        result = run("list: username not in usernames", old_collect_comment_usernames, pages, args.n)
+        assert result == expected, "deduplicated orders differ"
+    print(f"{len(expected):,} distinct commenters")
+
+    # Streaming across posts: one UniqueUsernames shared by every post
+    posts = [make_pages(args.n, args.users, seed) for seed in range(args.posts)]
+    seen = UniqueUsernames()
+    start = time.perf_counter()
+    new = [len(collect_comment_usernames(streamed(post), seen)) for post in posts]
+    seconds = time.perf_counter() - start
+    total = args.n * args.posts
+    print(f"{'set: shared across ' + str(args.posts) + ' posts':<40} {seconds:9.3f} s "
+          f"{total / seconds:14,.0f} comments/s")
+    print(f"new commenters per post: {new}, {len(seen):,} in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Microbenchmark: decoding GraphQL comment pages and web_profile_info replies.
+
+Compares the stdlib path (json.loads, as response.json() does, then walking
+the dicts) with orjson and with decoding.py's typed decoders (msgspec when
+installed). Uses recorded replies from --fixtures DIR (same layout as
+mock_instagram.py: posts/<shortcode>.json holding a `shortcode_media`
+object, profiles/<username>.json holding a `user` object) or synthetic ones.
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --fixtures recorded/ -n 20000
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import decoding  # noqa: E402
+from decoding import comment_page_from_media, decode_comment_page, decode_profile  # noqa: E402
+from profiles import parse_profile_response  # noqa: E402
+from mock_instagram import MockConfig, make_post  # noqa: E402
+from bench_profile_memory import make_reply  # noqa: E402
+
+
+def load_payloads(fixtures: str) -> tuple:
+    """(post replies, profile replies) as raw response bodies."""
+    if fixtures:
+        posts = []
+        for path in sorted(glob.glob(os.path.join(fixtures, "posts", "*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                posts.append(json.dumps({"data": {"shortcode_media": json.load(f)}}).encode("utf-8"))
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(fixtures, "profiles", "*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                profiles.append(json.dumps({"data": {"user": json.load(f)}}).encode("utf-8"))
+        return posts, profiles
+    config = MockConfig(comments_per_post=50)
+    posts = [json.dumps({"data": {"shortcode_media": make_post(config, f"P{i:04d}", 50, None)}},
+                        ensure_ascii=False).encode("utf-8") for i in range(20)]
+    profiles = [make_reply(i).encode("utf-8") for i in range(20)]
+    return posts, profiles
+
+
+def run(name: str, func, payloads: list, n: int):
+    start = time.perf_counter()
+    for i in range(n):
+        func(payloads[i % len(payloads)])
+    seconds = time.perf_counter() - start
+    size = sum(map(len, payloads)) / len(payloads)
+    print(f"{name:<36} {n / seconds:12,.0f} replies/s {n * size / seconds / 2**20:8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=20000, help="replies decoded per benchmark")
+    parser.add_argument("--fixtures", default=None, help="directory of recorded replies")
+    args = parser.parse_args()
+
+    posts, profiles = load_payloads(args.fixtures)
+    if not posts or not profiles:
+        parser.error(f"no posts/ or profiles/ replies found in {args.fixtures}")
+    print(f"decoding backend: {decoding.JSON_BACKEND}; "
+          f"{len(posts)} post replies (avg {sum(map(len, posts)) / len(posts) / 1024:.1f} KB), "
+          f"{len(profiles)} profile replies (avg {sum(map(len, profiles)) / len(profiles) / 1024:.1f} KB)")
+
+    run("comment page: json.loads + walk",
+        lambda b: comment_page_from_media(json.loads(b)["data"]["shortcode_media"]), posts, args.n)
+    if decoding.orjson is not None:
+        run("comment page: orjson.loads + walk",
+            lambda b: comment_page_from_media(decoding.orjson.loads(b)["data"]["shortcode_media"]),
+            posts, args.n)
+    run("comment page: decode_comment_page", decode_comment_page, posts, args.n)
+
+    run("profile: json.loads + Profile",
+        lambda b: parse_profile_response(json.loads(b)), profiles, args.n)
+    if decoding.orjson is not None:
+        run("profile: orjson.loads + Profile",
+            lambda b: parse_profile_response(decoding.orjson.loads(b)), profiles, args.n)
+    run("profile: decode_profile", decode_profile, profiles, args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Offline benchmark of the scraper against the local mock server.
+
+Starts benchmarks/mock_instagram.py in-process, points the scraper at it
+through INSTAGRAM_WEB_BASE / INSTAGRAM_API_BASE and measures:
+  - scrape_post:       sequential comment-page requests
+  - get_user_profile:  sequential profile requests
+  - pipeline:          async_pipeline.run_pipeline end to end
+reporting requests/s, p50/p99 latency and total run time.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --latency 0.1 --rate-limit 0.05 --posts 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from mock_instagram import MockConfig, MockInstagramServer  # noqa: E402
+from sinks import RowSink  # noqa: E402
+
+PROFILE_FIELDNAMES = ["post_url", "username", "biography", "phone_number", "email", "link"]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: list, elapsed: float, requests: int) -> dict:
+    return {
+        "benchmark": name,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 1) if elapsed else 0.0,
+        # Per-request latency is only measured for the sequential benchmarks
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def bench_scrape_post(utils, server, n: int) -> dict:
+    client = utils.create_client()
+    latencies = []
+    before = server.stats.snapshot().get("graphql", 0)
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        utils.scrape_post(f"BENCH{i:05d}", client=client)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    client.close()
+    requests = server.stats.snapshot().get("graphql", 0) - before
+    return summarize("scrape_post", latencies, elapsed, requests)
+
+
+def bench_get_user_profile(utils, server, n: int) -> dict:
+    client = utils.create_client()
+    latencies = []
+    before = server.stats.snapshot().get("profile", 0)
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        utils.get_user_profile(f"user{i}", client)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    client.close()
+    requests = server.stats.snapshot().get("profile", 0) - before
+    return summarize("get_user_profile", latencies, elapsed, requests)
+
+
+def bench_pipeline(async_pipeline, server, posts: int, post_rate: float, profile_rate: float,
+                   max_comments: int) -> dict:
+    before = server.stats.snapshot()
+    post_urls = [f"https://www.instagram.com/p/PIPE{i:05d}/" for i in range(posts)]
+    with tempfile.TemporaryDirectory() as tmp, \
+            RowSink(os.path.join(tmp, "profiles_phone.csv"), PROFILE_FIELDNAMES) as sink:
+        start = time.perf_counter()
+        result = asyncio.run(async_pipeline.run_pipeline(
+            post_urls, {}, sink,
+            post_rate=post_rate, profile_rate=profile_rate,
+            post_workers=4, profile_workers=8, max_comments=max_comments
+        ))
+        elapsed = time.perf_counter() - start
+    after = server.stats.snapshot()
+    requests = sum(after.get(k, 0) - before.get(k, 0) for k in ("graphql", "profile"))
+    summary = summarize("pipeline (async)", [], elapsed, requests)
+    summary.update({
+        "posts": posts,
+        "unique_users": result["unique_users"],
+        "requests_saved": result["requests_saved"],
+        "connections": result["connections"]
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper benchmark against a mock server.")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="mock extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of 429 replies")
+    parser.add_argument("--requests", type=int, default=100, help="requests per micro benchmark")
+    parser.add_argument("--posts", type=int, default=10, help="posts in the pipeline run")
+    parser.add_argument("--max-comments", type=int, default=100)
+    parser.add_argument("--post-rate", type=float, default=50.0, help="starting GraphQL requests/s")
+    parser.add_argument("--profile-rate", type=float, default=50.0, help="starting profile requests/s")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        rate_limit=args.rate_limit, comments_per_post=args.max_comments * 2,
+                        users=args.posts * args.max_comments)
+    server = MockInstagramServer(config).start_background()
+    os.environ["INSTAGRAM_WEB_BASE"] = server.base_url
+    os.environ["INSTAGRAM_API_BASE"] = server.base_url
+
+    # Imported after the environment points at the mock server
+    import utils
+    import async_pipeline
+    from governor import configure_governor, GRAPHQL, PROFILE
+
+    # The sequential benchmarks go through the shared governors; no pacing jitter
+    configure_governor(GRAPHQL, args.post_rate, jitter=0.0)
+    configure_governor(PROFILE, args.profile_rate, jitter=0.0)
+
+    results = [
+        bench_scrape_post(utils, server, args.requests),
+        bench_get_user_profile(utils, server, args.requests),
+        bench_pipeline(async_pipeline, server, args.posts, args.post_rate,
+                       args.profile_rate, args.max_comments),
+    ]
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps({"results": results, "server": server.stats.snapshot()}, indent=2))
+        return
+    print(f"\n{'benchmark':<20} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8}")
+    for r in results:
+        p50 = "-" if r["p50_ms"] is None else r["p50_ms"]
+        p99 = "-" if r["p99_ms"] is None else r["p99_ms"]
+        print(f"{r['benchmark']:<20} {r['requests']:>9} {r['requests_per_s']:>8} "
+              f"{p50:>8} {p99:>8} {r['elapsed_s']:>8}")
+    pipeline = results[-1]
+    print(f"pipeline: {pipeline['posts']} posts, {pipeline['unique_users']} unique users, "
+          f"{pipeline['requests_saved']} requests saved, {pipeline['connections']}")
+    print(f"server counters: {server.stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Peak RSS of holding parsed profiles: raw `data.user` dicts (what the
+scripts used to keep until the end of a run) vs compact profiles.Profile
+records.
+
+Each mode runs in a fresh interpreter, parses N synthetic web_profile_info
+replies shaped like the real ones (timeline media, related profiles, ...)
+and keeps the result for every user; peak RSS is read from getrusage.
+
+    python benchmarks/bench_profile_memory.py            # 10,000 profiles
+    python benchmarks/bench_profile_memory.py -n 50000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("none", "raw", "compact")
+
+
+def make_reply(i: int) -> str:
+    """JSON text of one web_profile_info reply (~30 KB, like a public account)."""
+    username = f"user{i}"
+    url = f"https://scontent.cdninstagram.com/v/t51.2885-15/{i}_n.jpg?stp=dst-jpg_e35&_nc_ht=scontent&oh=00_{i:040d}"
+    media = [{"node": {
+        "id": f"{i}{j:03d}",
+        "shortcode": f"C{i:08d}{j:02d}",
+        "display_url": url,
+        "thumbnail_resources": [{"src": url, "config_width": w, "config_height": w}
+                                for w in (150, 240, 320, 480, 640)],
+        "dimensions": {"height": 1080, "width": 1080},
+        "edge_media_to_caption": {"edges": [{"node": {"text": "new arrivals, DM to order ✨ " * 8}}]},
+        "edge_liked_by": {"count": j * 13},
+        "edge_media_to_comment": {"count": j * 3},
+        "taken_at_timestamp": 1700000000 + j,
+        "is_video": False,
+        "accessibility_caption": "Photo by " + username
+    }} for j in range(12)]
+    related = [{"node": {
+        "id": str(i * 100 + j),
+        "username": f"related{i}_{j}",
+        "full_name": f"Related {j}",
+        "profile_pic_url": url,
+        "is_verified": False
+    }} for j in range(20)]
+    user = {
+        "id": str(i),
+        "username": username,
+        "full_name": f"User {i}",
+        "biography": f"health coach | vitamins & supplements | +1 555 {i % 1000:03d} {i % 10000:04d}",
+        "external_url": f"https://linktr.ee/{username}",
+        "profile_pic_url": url,
+        "profile_pic_url_hd": url,
+        "edge_followed_by": {"count": i % 100000},
+        "edge_follow": {"count": 321},
+        "is_private": False,
+        "is_business_account": True,
+        "business_category_name": "Health/beauty",
+        "edge_owner_to_timeline_media": {"count": 500, "edges": media,
+                                         "page_info": {"has_next_page": True, "end_cursor": "Q" * 100}},
+        "edge_related_profiles": {"edges": related},
+        "edge_felix_video_timeline": {"count": 0, "edges": []},
+    }
+    return json.dumps({"data": {"user": user}, "status": "ok"}, ensure_ascii=False)
+
+
+def run_mode(mode: str, n: int) -> int:
+    """Parse n replies, keep what `mode` keeps, return peak RSS in KB."""
+    from profiles import parse_profile_response
+
+    kept = []
+    for i in range(n):
+        data = json.loads(make_reply(i))
+        if mode == "raw":
+            kept.append(data["data"]["user"])
+        elif mode == "compact":
+            kept.append(parse_profile_response(data, f"user{i}"))
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode: str, n: int) -> int:
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "-n", str(n)],
+                         check=True, capture_output=True, text=True).stdout
+    return int(out.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=10000, help="number of profiles")
+    parser.add_argument("--mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(run_mode(args.mode, args.n))
+        return
+
+    print(f"{args.n:,} profiles, {len(make_reply(0)) / 1024:.0f} KB of JSON each")
+    baseline = measure("none", args.n)
+    print(f"{'kept':<22} {'peak RSS':>10} {'over baseline':>14} {'per 10k':>10}")
+    for mode, label in (("none", "nothing (baseline)"), ("raw", "raw data.user dicts"),
+                        ("compact", "Profile records")):
+        rss = baseline if mode == "none" else measure(mode, args.n)
+        extra = rss - baseline
+        print(f"{label:<22} {rss / 1024:>8.1f} MB {extra / 1024:>11.1f} MB "
+              f"{extra / 1024 * 10000 / args.n:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
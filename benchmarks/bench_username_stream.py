@@ -0,0 +1,92 @@
+"""
+Time to the first username and peak RSS when reading a large comments.csv:
+the old read_usernames_from_csv (a set of every username, built before any
+profile request) vs the streaming phone2_eng.iter_usernames_from_csv.
+
+Each mode runs in a fresh interpreter on a synthetic comments.csv with N
+rows; peak RSS is read from getrusage.
+
+    python benchmarks/bench_username_stream.py            # 2,000,000 rows
+    python benchmarks/bench_username_stream.py -n 5000000 --users 3000000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("set", "stream")
+
+
+# The pre-streaming implementation, kept for comparison
+def old_read_usernames_from_csv(filename: str) -> set:
+    usernames = set()
+    with open(filename, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if "comment_username" in row and row["comment_username"]:
+                usernames.add(row["comment_username"].strip())
+    return usernames
+
+
+def make_csv(filename: str, n: int, users: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("post_url,comment_username\n")
+        for i in range(n):
+            f.write(f"https://www.instagram.com/p/P{i // 200:06d}/,user{rng.randrange(users)}\n")
+
+
+def run_mode(mode: str, filename: str) -> dict:
+    """Read every username of `filename` the way `mode` does."""
+    start = time.perf_counter()
+    if mode == "set":
+        usernames = iter(old_read_usernames_from_csv(filename))
+    else:
+        import phone2_eng
+        usernames = phone2_eng.iter_usernames_from_csv(filename)
+    next(usernames)
+    first = time.perf_counter() - start
+    count = 1 + sum(1 for _ in usernames)
+    return {"first": first, "total": time.perf_counter() - start, "count": count,
+            "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def measure(mode: str, filename: str) -> dict:
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--csv", filename],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=2000000, help="rows of comments.csv")
+    parser.add_argument("--users", type=int, default=1000000, help="size of the commenter pool")
+    parser.add_argument("--mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--csv", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.csv)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "comments.csv")
+        make_csv(filename, args.n, args.users)
+        print(f"{args.n:,} rows, {os.path.getsize(filename) / 2**20:.0f} MB of CSV")
+        print(f"{'reader':<24} {'first name':>10} {'all names':>10} {'unique':>10} {'peak RSS':>10}")
+        for mode, label in (("set", "set (old)"), ("stream", "stream + SpillDeduper")):
+            result = measure(mode, filename)
+            print(f"{label:<24} {result['first']:>9.3f}s {result['total']:>9.1f}s "
+                  f"{result['count']:>10,} {result['rss'] / 1024:>7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Local stand-in for the Instagram endpoints used by the scraper.
+
+Serves synthetic (or recorded) responses for
+  POST /graphql/query                         (post + paged comments)
+  GET  /api/v1/users/web_profile_info/        (profile)
+  POST /api/v1/tags/<hashtag>/sections/       (hashtag feed)
+  GET  /api/v1/accounts/current_user/         (logged-in viewer, for the cookie check)
+with configurable latency, error rate and 429 rate, so scraper throughput
+can be measured offline.
+
+    python benchmarks/mock_instagram.py --port 8765 --latency 0.05 --rate-limit 0.02
+
+then point the scraper at it:
+
+    INSTAGRAM_WEB_BASE=http://127.0.0.1:8765 INSTAGRAM_API_BASE=http://127.0.0.1:8765 python3 main.py
+
+Recorded responses: with --fixtures DIR, `DIR/posts/<shortcode>.json`
+(a `shortcode_media` object) and `DIR/profiles/<username>.json` (a `user`
+object) are served instead of synthetic data when present.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockConfig:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, retry_after: int = 1, comments_per_post: int = 200,
+                 users: int = 1000, posts_per_tag: int = 100, fixtures: str = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.comments_per_post = comments_per_post
+        self.users = users
+        self.posts_per_tag = posts_per_tag
+        self.fixtures = fixtures
+        self.rng = random.Random(seed)
+
+
+class MockStats:
+    """Request counters, shared by all handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, key: str):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+def _stable_int(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _load_fixture(config: MockConfig, kind: str, key: str):
+    if not config.fixtures:
+        return None
+    path = os.path.join(config.fixtures, kind, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------------------------
+# Synthetic payloads
+# ---------------------------
+
+def make_post(config: MockConfig, shortcode: str, first: int, after: str) -> dict:
+    start = int(after) if after else 0
+    end = min(start + first, config.comments_per_post)
+    base = _stable_int(shortcode)
+    edges = []
+    for i in range(start, end):
+        user = (base + i * 7919) % config.users
+        edges.append({"node": {
+            "id": f"{base}{i}",
+            "text": "great post " * 3,
+            "created_at": 1700000000 + i,
+            "owner": {"id": str(user), "username": f"user{user}"}
+        }})
+    return {
+        "shortcode": shortcode,
+        "edge_media_to_parent_comment": {
+            "count": config.comments_per_post,
+            "edges": edges,
+            "page_info": {
+                "has_next_page": end < config.comments_per_post,
+                "end_cursor": str(end) if end < config.comments_per_post else None
+            }
+        }
+    }
+
+
+def make_profile(username: str) -> dict:
+    n = _stable_int(username)
+    bio = "health coach | vitamins & supplements"
+    if n % 3 == 0:
+        bio += f" | call +1 555 {n % 1000:03d} {n % 10000:04d}"
+    if n % 4 == 0:
+        bio += f" | {username}@example.com"
+    if n % 5 == 0:
+        bio += f" | https://linktr.ee/{username}"
+    return {
+        "username": username,
+        "full_name": username.title(),
+        "biography": bio,
+        "edge_followed_by": {"count": n % 100000},
+        # Padding standing in for the timeline/related-profile subtrees of real replies
+        "edge_owner_to_timeline_media": {"edges": [{"node": {"id": str(i), "display_url": "x" * 200}}
+                                                   for i in range(12)]}
+    }
+
+
+def make_tag_page(config: MockConfig, hashtag: str, max_id: str) -> dict:
+    start = int(max_id) if max_id else 0
+    end = min(start + 24, config.posts_per_tag)
+    base = _stable_int(hashtag)
+    # "recent" tab: newest first
+    medias = [{"media": {"code": f"P{(base + i) % 10**8:08d}",
+                         "taken_at": 1700000000 + (config.posts_per_tag - i) * 600,
+                         "comment_count": config.comments_per_post}}
+              for i in range(start, end)]
+    return {
+        "sections": [{"layout_content": {"medias": medias}}],
+        "more_available": end < config.posts_per_tag,
+        "next_max_id": str(end),
+        "next_page": end // 24
+    }
+
+# ---------------------------
+# HTTP handler
+# ---------------------------
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+    # Headers and body are written separately; without this, Nagle + delayed
+    # ACK add ~40 ms to every response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def _simulate(self, endpoint: str) -> bool:
+        """Apply latency and injected failures; return False if a failure was sent."""
+        config, stats = self.server.config, self.server.stats
+        stats.add(endpoint)
+        delay = config.latency + (config.rng.uniform(0, config.jitter) if config.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        roll = config.rng.random()
+        if roll < config.rate_limit:
+            stats.add("429")
+            self._send_json(429, {"message": "Please wait a few minutes before you try again.",
+                                  "status": "fail"},
+                            {"Retry-After": str(config.retry_after)})
+            return False
+        if roll < config.rate_limit + config.error_rate:
+            stats.add("500")
+            self._send_json(500, {"status": "fail"})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") == "/api/v1/users/web_profile_info":
+            username = parse_qs(url.query).get("username", [""])[0]
+            if not self._simulate("profile"):
+                return
+            user = _load_fixture(self.server.config, "profiles", username) or make_profile(username)
+            self._send_json(200, {"data": {"user": user}, "status": "ok"})
+        elif url.path.rstrip("/") == "/api/v1/accounts/current_user":
+            # Any sessionid except "expired" counts as logged in
+            session = SimpleCookie(self.headers.get("Cookie", "")).get("sessionid")
+            if session is None or session.value == "expired":
+                self._send_json(403, {"message": "login_required", "require_login": True,
+                                      "status": "fail"})
+            else:
+                self._send_json(200, {"user": {"pk": "1", "username": "mock_viewer"}, "status": "ok"})
+        else:
+            self._send_json(404, {"status": "fail"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        form = self._read_form()
+        if url.path.rstrip("/") == "/graphql/query":
+            if not self._simulate("graphql"):
+                return
+            variables = json.loads(form.get("variables", "{}"))
+            shortcode = variables.get("shortcode", "")
+            media = _load_fixture(self.server.config, "posts", shortcode)
+            if media is None:
+                media = make_post(self.server.config, shortcode,
+                                  variables.get("first", 50), variables.get("after"))
+            self._send_json(200, {"data": {"shortcode_media": media}, "status": "ok"})
+        elif url.path.startswith("/api/v1/tags/") and url.path.rstrip("/").endswith("/sections"):
+            if not self._simulate("tags"):
+                return
+            hashtag = url.path.split("/")[4]
+            self._send_json(200, make_tag_page(self.server.config, hashtag, form.get("max_id")))
+        else:
+            self._send_json(404, {"status": "fail"})
+
+
+class MockInstagramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), MockHandler)
+        self.config = config
+        self.stats = MockStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Instagram endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 replies")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of 429 replies")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--comments", type=int, default=200, help="comments per post")
+    parser.add_argument("--users", type=int, default=1000, help="size of the commenter pool")
+    parser.add_argument("--fixtures", default=None, help="directory of recorded responses")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        rate_limit=args.rate_limit, retry_after=args.retry_after,
+                        comments_per_post=args.comments, users=args.users, fixtures=args.fixtures)
+    server = MockInstagramServer(config, args.host, args.port)
+    print(f"Mock Instagram listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
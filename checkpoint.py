@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Checkpoint journal
+# ---------------------------
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON-lines journal of completed work, used to resume an
+    interrupted run. Each line is one record:
+
+        {"kind": "run",  "key": <hashtag>, "post_urls": [...]}   (one per hashtag)
+        {"kind": "post", "key": <post_url>, "usernames": [...], "comments": [...]}
+        {"kind": "user", "key": <username>, "row": {...}}
+
+    A record is only written after the work it describes has been flushed to
+    the output file, so everything in the journal can be skipped on restart.
+    Failed fetches are not recorded, so a resumed run retries them.
+    A torn last line (crash mid-write) is ignored when loading. A post's
+    optional "comments" entry is the crawl_index.CommentState its visit
+    ended at, saved to the crawl index once the run completes.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.records = {"run": {}, "post": {}, "user": {}}
+        if resume and os.path.exists(path):
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+        self.f = open(path, "a", encoding="utf-8")
+        if self.f.tell() > 0:
+            # Terminate a torn last line so the next record starts on its own line
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.f.write("\n")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records.setdefault(record["kind"], {})[record["key"]] = record
+        logger.info("Resuming from %s: %d posts and %d users already done.",
+                    self.path, len(self.records["post"]), len(self.records["user"]))
+
+    def _append(self, record: dict):
+        self.records.setdefault(record["kind"], {})[record["key"]] = record
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    # -- run --
+
+    def get_runs(self) -> dict:
+        """Return {hashtag: post_urls} for every hashtag discovered so far (batch runs)."""
+        return {key: record["post_urls"] for key, record in self.records["run"].items()}
+
+    def mark_run(self, hashtag: str, post_urls: list):
+        self._append({"kind": "run", "key": hashtag, "post_urls": post_urls})
+
+    # -- posts --
+
+    def post_usernames(self, post_url: str) -> list:
+        """Return the commenters recorded for a finished post, or None."""
+        record = self.records["post"].get(post_url)
+        return record["usernames"] if record else None
+
+    def post_comment_state(self, post_url: str) -> list:
+        """Return the comment state recorded for a finished post, or None."""
+        record = self.records["post"].get(post_url)
+        return record.get("comments") if record else None
+
+    def mark_post(self, post_url: str, usernames: list, comments: tuple = None):
+        record = {"kind": "post", "key": post_url, "usernames": usernames}
+        if comments is not None:
+            record["comments"] = list(comments)
+        self._append(record)
+
+    # -- users --
+
+    def user_done(self, username: str) -> bool:
+        return username in self.records["user"]
+
+    def user_row(self, username: str) -> dict:
+        """Return the contact fields written for a finished user, or None."""
+        record = self.records["user"].get(username)
+        return record["row"] if record else None
+
+    def mark_user(self, username: str, row: dict = None):
+        self._append({"kind": "user", "key": username, "row": row})
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -82,7 +82,7 @@ def scrape_post(url_or_shortcode: str, cookies: dict) -> dict:
     }
     
     response = httpx.post(url=graphql_url, headers=headers, data=body, cookies=cookies, timeout=60.0)
-    print("Response text:", response.text)  
+    print(f"Response: status {response.status_code}, {len(response.content)} bytes")
     try:
         data = response.json()
         # 根据当前返回结构，评论数据通常在 data["shortcode_media"]["edge_media_to_comment"]
@@ -98,6 +98,7 @@ def extract_comment_usernames(post_json: dict) -> list:
     否则使用 edge_media_to_comment。
     """
     usernames = []
+    seen = set()  # 与 usernames 同步，O(1) 判重
     comment_data = None
     if "edge_media_to_parent_comment" in post_json:
         comment_data = post_json["edge_media_to_parent_comment"]
@@ -109,7 +110,8 @@ def extract_comment_usernames(post_json: dict) -> list:
             node = edge.get("node", {})
             owner = node.get("owner", {})
             username = owner.get("username")
-            if username and username not in usernames:
+            if username and username not in seen:
+                seen.add(username)
                 usernames.append(username)
     return usernames
 
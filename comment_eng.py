@@ -9,6 +9,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from decoding import comment_page_from_media
+from store import CrawlStore
+
 INSTAGRAM_QUERY_HASH = "97b41c52301f77ce508f55e66d17620e"
 
 def get_hashtag_posts(hashtag: str, scroll_times=2):
@@ -90,7 +93,8 @@ def scrape_post(url_or_shortcode: str, cookies: dict) -> dict:
     }
     
     response = httpx.post(url=graphql_url, headers=headers, data=body, cookies=cookies, timeout=60.0)
-    print("Response text:", response.text)  
+    # The full response body can be hundreds of KB; log only its size
+    print(f"Response: status {response.status_code}, {len(response.content)} bytes")
     try:
         data = response.json()
         # Based on the current response structure, comment data is usually in data["shortcode_media"]["edge_media_to_comment"]
@@ -106,6 +110,7 @@ def extract_comment_usernames(post_json: dict) -> list:
     otherwise, use 'edge_media_to_comment'.
     """
     usernames = []
+    seen = set()  # mirrors usernames for O(1) membership checks
     comment_data = None
     if "edge_media_to_parent_comment" in post_json:
         comment_data = post_json["edge_media_to_parent_comment"]
@@ -117,7 +122,8 @@ def extract_comment_usernames(post_json: dict) -> list:
             node = edge.get("node", {})
             owner = node.get("owner", {})
             username = owner.get("username")
-            if username and username not in usernames:
+            if username and username not in seen:
+                seen.add(username)
                 usernames.append(username)
     return usernames
 
@@ -138,6 +144,8 @@ def main():
     driver.quit()
     
     results = []  # (post_url, comment_username)
+    # Comments also go to the shared SQLite store, read by phone2_eng.py --store
+    store = CrawlStore()
     
     for post_url in post_urls:
         print(f"Processing post: {post_url}")
@@ -145,6 +153,9 @@ def main():
         if not post_json:
             print(f"Failed to get post data: {post_url}")
             continue
+        shortcode = post_url.split("/p/")[-1].split("/")[0]
+        store.add_post(shortcode, post_url, hashtag, scraped=True)
+        store.add_comments(shortcode, comment_page_from_media(post_json).comments)
         usernames = extract_comment_usernames(post_json)
         if usernames:
             print(f"Found comment usernames: {usernames}")
@@ -160,7 +171,8 @@ def main():
         writer.writerow(["post_url", "comment_username"])
         writer.writerows(results)
     
-    print(f"Saved results to {csv_filename}")
+    store.close()
+    print(f"Saved results to {csv_filename} and {store.path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,108 @@
+import re
+from typing import NamedTuple
+
+# ---------------------------
+# Contact patterns
+# ---------------------------
+
+# Compiled once at import; adjust these to the formats you see in biographies.
+PHONE_PATTERN = re.compile(r'(\+?\d[\d\s\-]{8,}\d)')
+EMAIL_PATTERN = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+LINK_PATTERN = re.compile(r'https?://[^\s]+')
+
+# All three as one alternation so a bio is scanned once. Links and emails come
+# first so digits inside a URL or address are not reported as a phone number.
+# The branches are rewritten (same matches as the patterns above) so that
+# Python's regex engine can reject most positions cheaply:
+#   - an email may only start where the local part starts (possessive
+#     quantifiers would need Python 3.11, and the lookbehind already keeps
+#     the engine from retrying inside a local part);
+#   - a phone starts with a [+digit] character class instead of an optional '+'.
+_EMAIL_CHARS = "A-Za-z0-9._%+-"
+CONTACT_PATTERN = re.compile(
+    r'(?P<link>https?://[^\s]+)'
+    r'|(?<![' + _EMAIL_CHARS + r'])(?P<email>[' + _EMAIL_CHARS + r']+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})'
+    r'|(?P<phone>[\d+](?:(?<=\+)\d|(?<=\d))[\d\s\-]{8,}\d)'
+)
+# Every contact contains '@', 'http' or a digit; texts without any are skipped.
+_DIGIT = re.compile(r'\d')
+
+CONTACT_KINDS = ("phone", "email", "link")
+
+
+class ContactMatch(NamedTuple):
+    kind: str    # "phone", "email" or "link"
+    value: str
+    start: int
+    end: int
+
+
+class ContactExtractor:
+    """
+    Single-pass contact extraction: one compiled regex finds every phone,
+    email and link in a text, with their spans.
+    """
+
+    def __init__(self, pattern: re.Pattern = CONTACT_PATTERN):
+        self.pattern = pattern
+
+    @staticmethod
+    def _may_contain_contact(text: str) -> bool:
+        return bool(text) and ("@" in text or "http" in text or _DIGIT.search(text) is not None)
+
+    def scan(self, text: str) -> list:
+        """Return every ContactMatch in `text`, in order of appearance."""
+        if not self._may_contain_contact(text):
+            return []
+        return [
+            ContactMatch(m.lastgroup, m.group(), m.start(), m.end())
+            for m in self.pattern.finditer(text)
+        ]
+
+    def extract(self, text: str) -> dict:
+        """Return {"phones": [...], "emails": [...], "links": [...]} for `text`."""
+        result = {"phones": [], "emails": [], "links": []}
+        if self._may_contain_contact(text):
+            for m in self.pattern.finditer(text):
+                result[m.lastgroup + "s"].append(m.group())
+        return result
+
+    def first(self, text: str) -> dict:
+        """
+        Return the first phone, email and link as the CSV fields
+        {"phone_number", "email", "link"} ("" when absent).
+        """
+        found = {}
+        if self._may_contain_contact(text):
+            for m in self.pattern.finditer(text):
+                found.setdefault(m.lastgroup, m.group())
+                if len(found) == len(CONTACT_KINDS):
+                    break
+        return {
+            "phone_number": found.get("phone", ""),
+            "email": found.get("email", ""),
+            "link": found.get("link", "")
+        }
+
+    def extract_batch(self, texts) -> list:
+        """Apply extract() to every text of an iterable of bios."""
+        # Same as [self.extract(t) for t in texts] with the lookups hoisted out of the loop
+        finditer = self.pattern.finditer
+        digit_search = _DIGIT.search
+        results = []
+        append = results.append
+        for text in texts:
+            result = {"phones": [], "emails": [], "links": []}
+            if text and ("@" in text or "http" in text or digit_search(text)):
+                for m in finditer(text):
+                    result[m.lastgroup + "s"].append(m.group())
+            append(result)
+        return results
+
+
+default_extractor = ContactExtractor()
+
+
+def extract_contacts(bio: str) -> dict:
+    """First phone/email/link of a biography, keyed like the output CSV columns."""
+    return default_extractor.first(bio)
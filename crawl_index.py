@@ -0,0 +1,257 @@
+import json
+import logging
+import sqlite3
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Incremental crawl index
+# ---------------------------
+
+DEFAULT_INDEX_PATH = "crawl_index.db"
+# Consecutive already-processed posts, older than anything processed before,
+# after which discovery assumes the rest of the feed is old as well.
+DEFAULT_STOP_AFTER_SEEN = 3
+
+
+class FeedPost(NamedTuple):
+    shortcode: str
+    taken_at: int        # unix time, 0 if unknown
+    comment_count: int   # None if unknown (e.g. Selenium discovery)
+
+
+class CommentState(NamedTuple):
+    """Where the last visit of a post's comments ended."""
+    comment_count: int        # total comments the post reported
+    newest_ids: tuple         # ids of the comments seen in the newest second
+    newest_created_at: int
+    resume_cursor: str        # `after` cursor of the last page fetched (None: first page)
+
+
+class CommentDelta:
+    """
+    Tracks one visit of a post's comments against the CommentState saved by
+    the previous visit, so only newer comments are fetched and yielded.
+
+    Works with either page order: the visit starts at the page where the
+    previous one ended (new comments are appended there when the feed is
+    oldest-first), and stops paging at the first page holding an
+    already-seen comment when the feed is newest-first.
+    """
+
+    def __init__(self, previous: CommentState = None):
+        self.previous = previous
+        self.resume_from = previous.resume_cursor if previous else None
+        self.comment_count = previous.comment_count if previous else 0
+        self.newest_ids = list(previous.newest_ids) if previous else []
+        self.newest_created_at = previous.newest_created_at if previous else 0
+        self.resume_cursor = self.resume_from
+
+    def is_new(self, comment) -> bool:
+        if self.previous is None:
+            return True
+        newest = self.previous.newest_created_at
+        # Timestamps have one-second resolution; ids tell same-second comments apart
+        return comment.created_at > newest or (comment.created_at == newest
+                                               and comment.id not in self.previous.newest_ids)
+
+    def cursor_rejected(self, after: str, page) -> bool:
+        """
+        True if `page`, a successful reply to the saved resume cursor, holds
+        neither comments nor a comment count, i.e. the cursor has expired.
+        """
+        return (self.previous is not None and after is not None and after == self.resume_from
+                and not page.comments and not page.count)
+
+    def observe_page(self, after: str, page) -> bool:
+        """Record a fetched page; return False if paging can stop after it."""
+        comments = page.comments
+        if page.count:
+            self.comment_count = page.count
+        newest_first = len(comments) > 1 and comments[0].created_at > comments[-1].created_at
+        if newest_first:
+            # New comments show up on the first page; never resume deeper
+            self.resume_cursor = None
+        elif comments:
+            self.resume_cursor = after
+        return not (newest_first and self.previous is not None and not self.is_new(comments[-1]))
+
+    def seen(self, comment):
+        """Record a comment handed to the caller."""
+        if comment.created_at > self.newest_created_at:
+            self.newest_created_at = comment.created_at
+            self.newest_ids = [comment.id]
+        elif comment.created_at == self.newest_created_at and comment.id not in self.newest_ids:
+            self.newest_ids.append(comment.id)
+
+    def restart(self):
+        """Forget the resume cursor (e.g. it expired) and page from the start."""
+        self.resume_from = None
+        self.resume_cursor = None
+
+    def state(self) -> CommentState:
+        return CommentState(self.comment_count, tuple(self.newest_ids), self.newest_created_at,
+                            self.resume_cursor)
+
+
+class CrawlIndex:
+    """
+    SQLite index of the posts seen per hashtag, so recurring crawls only
+    process what changed since the last run.
+
+    Every discovered post is noted with its timestamp and comment count;
+    once its comments are scraped it is marked processed with that count.
+    A post needs processing again only if it was never processed or its
+    comment count grew since. Per post, the CommentState of the last visit
+    is kept so a revisit only fetches the newer comments.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " hashtag TEXT NOT NULL,"
+            " shortcode TEXT NOT NULL,"
+            " taken_at INTEGER NOT NULL DEFAULT 0,"
+            " comment_count INTEGER,"      # as last discovered
+            " processed_count INTEGER,"    # comment count when last processed, NULL if never
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (hashtag, shortcode))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS comment_state ("
+            " shortcode TEXT PRIMARY KEY,"
+            " comment_count INTEGER NOT NULL,"
+            " newest_ids TEXT,"             # JSON list
+            " newest_created_at INTEGER NOT NULL,"
+            " resume_cursor TEXT,"
+            " updated_at REAL NOT NULL)"
+        )
+        # Older indexes kept only the single newest id; their states start without ids,
+        # so a revisit yields the comments of that newest second once more
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(comment_state)")}
+        if "newest_ids" not in columns:
+            self.conn.execute("ALTER TABLE comment_state ADD COLUMN newest_ids TEXT")
+        self.conn.commit()
+
+    def newest(self, hashtag: str) -> int:
+        """Timestamp of the newest processed post of `hashtag` (0 if none)."""
+        row = self.conn.execute(
+            "SELECT MAX(taken_at) FROM posts WHERE hashtag = ? AND processed_count IS NOT NULL",
+            (hashtag,)
+        ).fetchone()
+        return row[0] or 0
+
+    def needs_processing(self, hashtag: str, post: FeedPost) -> bool:
+        row = self.conn.execute(
+            "SELECT processed_count FROM posts WHERE hashtag = ? AND shortcode = ?",
+            (hashtag, post.shortcode)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return True
+        return post.comment_count is not None and post.comment_count > row[0]
+
+    def note(self, hashtag: str, posts: list):
+        """Record discovered posts (timestamp and current comment count)."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO posts (hashtag, shortcode, taken_at, comment_count, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (hashtag, shortcode) DO UPDATE SET"
+            " taken_at = MAX(taken_at, excluded.taken_at),"
+            " comment_count = COALESCE(excluded.comment_count, comment_count),"
+            " updated_at = excluded.updated_at",
+            [(hashtag, p.shortcode, p.taken_at or 0, p.comment_count, now) for p in posts]
+        )
+        self.conn.commit()
+
+    def mark_processed(self, hashtag: str, shortcodes: list):
+        """Mark noted posts as processed at their last discovered comment count."""
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE posts SET processed_count = COALESCE(comment_count, 0), updated_at = ?"
+            " WHERE hashtag = ? AND shortcode = ?",
+            [(now, hashtag, shortcode) for shortcode in shortcodes]
+        )
+        self.conn.commit()
+
+    def comment_state(self, shortcode: str) -> CommentState:
+        """The CommentState saved by the last visit of a post, or None."""
+        row = self.conn.execute(
+            "SELECT comment_count, newest_ids, newest_created_at, resume_cursor"
+            " FROM comment_state WHERE shortcode = ?", (shortcode,)
+        ).fetchone()
+        if row is None:
+            return None
+        count, newest_ids, newest_created_at, resume_cursor = row
+        return CommentState(count, tuple(json.loads(newest_ids or "[]")), newest_created_at, resume_cursor)
+
+    def save_comment_states(self, states: dict):
+        """Store {shortcode: CommentState} after a run."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO comment_state"
+            " (shortcode, comment_count, newest_ids, newest_created_at, resume_cursor, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(shortcode, state.comment_count, json.dumps(list(state.newest_ids)), state.newest_created_at,
+              state.resume_cursor, now)
+             for shortcode, state in states.items()]
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def select_new_posts(hashtag: str, feed, max_posts: int, index: CrawlIndex = None,
+                     stop_after_seen: int = DEFAULT_STOP_AFTER_SEEN) -> tuple:
+    """
+    Walk `feed` (FeedPosts, newest first) and pick up to `max_posts` distinct
+    posts that need processing. With an index, already-processed posts whose
+    comment count did not grow are skipped, and the walk stops after
+    `stop_after_seen` of them in a row that are no newer than the newest
+    processed post, so the feed is only paged as far as the new activity.
+    Posts without a known `taken_at` never end the walk, and
+    `stop_after_seen=None` (e.g. for the Selenium grid, which puts top
+    posts first) only skips processed posts.
+
+    Returns (posts to process, number of feed posts checked).
+    """
+    newest = index.newest(hashtag) if index else 0
+    selected = []
+    seen = set()
+    old_streak = 0
+    for post in feed:
+        if post.shortcode in seen:
+            continue
+        seen.add(post.shortcode)
+        if index is not None and post.comment_count == 0:
+            # Nothing to scrape; remember it so it is re-checked only once it has comments
+            index.note(hashtag, [post])
+            index.mark_processed(hashtag, [post.shortcode])
+            continue
+        if index is not None and not index.needs_processing(hashtag, post):
+            if stop_after_seen is not None and post.taken_at and post.taken_at <= newest:
+                old_streak += 1
+                if old_streak >= stop_after_seen:
+                    logger.info("#%s: reached already-processed posts, stopping discovery.", hashtag)
+                    break
+            continue
+        old_streak = 0
+        selected.append(post)
+        if len(selected) >= max_posts:
+            break
+    if index is not None:
+        index.note(hashtag, selected)
+        logger.info("#%s: %d feed posts checked, %d new or with new comments.",
+                    hashtag, len(seen), len(selected))
+    return selected, len(seen)
@@ -0,0 +1,179 @@
+import json
+from typing import NamedTuple, Optional, Union
+
+from profiles import Profile, parse_profile_response
+
+# ---------------------------
+# JSON backends
+# ---------------------------
+
+# Fastest available decoder, in this order everywhere: msgspec decodes
+# straight into the typed structs below and skips every field they do not
+# declare; orjson is a faster drop-in for json.loads; the stdlib is the
+# fallback. JSON_BACKEND names the one in use.
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if msgspec is not None:
+    JSON_BACKEND = "msgspec"
+elif orjson is not None:
+    JSON_BACKEND = "orjson"
+else:
+    JSON_BACKEND = "json"
+
+
+def loads(content):
+    """Decode a JSON document (bytes or str) into plain Python objects."""
+    if msgspec is not None:
+        return msgspec.json.decode(content)
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+# ---------------------------
+# Typed records
+# ---------------------------
+
+
+class Comment(NamedTuple):
+    id: str
+    username: str
+    text: str
+    created_at: int
+
+
+class CommentPage(NamedTuple):
+    comments: list     # Comment records of this page
+    count: int         # total comments reported for the post
+    end_cursor: str    # cursor of the next page, None on the last page
+
+
+EMPTY_PAGE = CommentPage((), 0, None)
+
+
+def _comment_id(value) -> str:
+    # Comment ids are numeric strings, but some replies send them as numbers
+    return "" if value is None else str(value)
+
+
+def comment_page_from_media(media: dict) -> CommentPage:
+    """
+    Build a CommentPage from a decoded `shortcode_media` object. Prefers
+    'edge_media_to_parent_comment', falls back to 'edge_media_to_comment'.
+    """
+    connection = (media or {}).get("edge_media_to_parent_comment") or \
+        (media or {}).get("edge_media_to_comment") or {}
+    comments = []
+    for edge in connection.get("edges") or ():
+        node = edge.get("node") or {}
+        comments.append(Comment(
+            _comment_id(node.get("id")),
+            (node.get("owner") or {}).get("username") or "",
+            node.get("text") or "",
+            node.get("created_at") or 0
+        ))
+    page_info = connection.get("page_info") or {}
+    end_cursor = page_info.get("end_cursor") if page_info.get("has_next_page") else None
+    return CommentPage(comments, connection.get("count") or 0, end_cursor or None)
+
+# ---------------------------
+# Response decoders
+# ---------------------------
+
+if msgspec is not None:
+    # Only the fields declared here are materialized; the rest of each reply
+    # (media URLs, captions, timeline and related-profile trees) is skipped.
+
+    class _Owner(msgspec.Struct):
+        username: Optional[str] = None
+
+    class _CommentNode(msgspec.Struct):
+        id: Union[str, int, None] = None
+        text: Optional[str] = None
+        created_at: Optional[int] = None
+        owner: Optional[_Owner] = None
+
+    class _CommentEdge(msgspec.Struct):
+        node: Optional[_CommentNode] = None
+
+    class _PageInfo(msgspec.Struct):
+        has_next_page: bool = False
+        end_cursor: Optional[str] = None
+
+    class _Connection(msgspec.Struct):
+        count: Optional[int] = None
+        edges: list[_CommentEdge] = msgspec.field(default_factory=list)
+        page_info: Optional[_PageInfo] = None
+
+    class _Media(msgspec.Struct):
+        edge_media_to_parent_comment: Optional[_Connection] = None
+        edge_media_to_comment: Optional[_Connection] = None
+
+    class _PostData(msgspec.Struct):
+        shortcode_media: Optional[_Media] = None
+
+    class _PostReply(msgspec.Struct):
+        data: _PostData
+
+    class _User(msgspec.Struct):
+        username: Optional[str] = None
+        full_name: Optional[str] = None
+        biography: Optional[str] = None
+        external_url: Optional[str] = None
+
+    class _ProfileData(msgspec.Struct):
+        user: Optional[_User] = None
+
+    class _ProfileReply(msgspec.Struct):
+        data: Optional[_ProfileData] = None
+
+    _post_decoder = msgspec.json.Decoder(_PostReply, strict=False)
+    _profile_decoder = msgspec.json.Decoder(_ProfileReply, strict=False)
+
+
+def decode_comment_page(content) -> CommentPage:
+    """
+    Decode a GraphQL post reply straight into a CommentPage.
+    Raises ValueError/KeyError if the reply has no `data` object.
+    """
+    if msgspec is None:
+        return comment_page_from_media(loads(content)["data"]["shortcode_media"])
+    try:
+        media = _post_decoder.decode(content).data.shortcode_media
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from None
+    if media is None:
+        return EMPTY_PAGE
+    connection = media.edge_media_to_parent_comment or media.edge_media_to_comment
+    if connection is None:
+        return EMPTY_PAGE
+    comments = [
+        Comment(_comment_id(node.id), (node.owner and node.owner.username) or "", node.text or "",
+                node.created_at or 0)
+        for node in (edge.node for edge in connection.edges) if node is not None
+    ]
+    page_info = connection.page_info
+    end_cursor = page_info.end_cursor if page_info and page_info.has_next_page else None
+    return CommentPage(comments, connection.count or 0, end_cursor or None)
+
+
+def decode_profile(content, username: str = "") -> Profile:
+    """Decode a web_profile_info reply into a Profile, or None if it has no user."""
+    if msgspec is None:
+        return parse_profile_response(loads(content), username)
+    try:
+        reply = _profile_decoder.decode(content)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from None
+    user = reply.data.user if reply.data else None
+    if user is None or user == _User():
+        return None
+    return Profile(user.username or username, user.full_name or "", user.biography or "",
+                   user.external_url or "")
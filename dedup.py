@@ -0,0 +1,106 @@
+import math
+import os
+import sqlite3
+import tempfile
+
+# ---------------------------
+# Streaming deduplication
+# ---------------------------
+
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_ERROR_RATE = 0.01
+SPILL_BATCH = 100000  # also the recent names checked in memory before the disk
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings: `x in bf` is never wrong for added
+    strings and wrong for at most ~`error_rate` of the others while no more
+    than `capacity` strings were added. 10M strings at 1% take ~12 MB.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item: str) -> list:
+        # Double hashing on the two halves of the built-in string hash: it is
+        # cached on the str object, and a filter never leaves its process
+        h = hash(item) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add `item`; return True if it was certainly not in the filter before."""
+        array = self.array
+        new = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not array[pos >> 3] & mask:
+                array[pos >> 3] |= mask
+                new = True
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        array = self.array
+        return all(array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SpillDeduper:
+    """
+    Exact deduplicator for streams too large to keep in a Python set.
+
+    A BloomFilter answers "never seen" for almost every new string without
+    touching disk; only its "maybe seen" answers are checked against an
+    exact copy of every string added, kept in a temporary SQLite file (the
+    spill file) that is written in batches and deleted on close().
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE,
+                 directory: str = None):
+        self.bloom = BloomFilter(capacity, error_rate)
+        fd, self.path = tempfile.mkstemp(prefix="dedup-", suffix=".db", dir=directory)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._pending = set()     # added since the last spill
+        self.count = 0
+        self.disk_checks = 0      # Bloom "maybe seen" answers checked on disk
+
+    def add(self, item: str) -> bool:
+        """Add `item`; return True if it was not seen before."""
+        if not self.bloom.add(item):
+            if item in self._pending:
+                return False
+            self.disk_checks += 1
+            if self.conn.execute("SELECT 1 FROM seen WHERE key = ?", (item,)).fetchone():
+                return False
+        self._pending.add(item)
+        self.count += 1
+        if len(self._pending) >= SPILL_BATCH:
+            self._spill()
+        return True
+
+    def _spill(self):
+        self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((k,) for k in self._pending))
+        self.conn.commit()
+        self._pending = set()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self.conn.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,79 @@
+"""
+Convert scraper output (comments.csv, profiles_phone.csv or .jsonl) into a
+Parquet dataset partitioned by hashtag and date, so analysis jobs read only
+the columns and partitions they need. Needs the optional `pyarrow` package.
+
+    python3 export.py profiles_phone.csv --hashtag 保健品
+    python3 export.py comments.csv --hashtag 保健品 --date 2026-10-18 --out datasets/comments
+
+The dataset is then read with e.g.
+
+    pyarrow.parquet.read_table("profiles_phone", columns=["username", "email"],
+                               filters=[("hashtag", "=", "保健品")])
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+
+from sinks import ParquetSink, run_partition
+from logs import add_logging_args, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_ROWS = 100000
+
+
+def iter_rows(filename: str):
+    """Yield (fieldnames, row) for every row of a CSV or JSON-lines file, streaming."""
+    with open(filename, "r", newline='', encoding="utf-8") as f:
+        if filename.endswith(".jsonl"):
+            fieldnames = None
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                fieldnames = fieldnames or list(row)
+                yield fieldnames, row
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.fieldnames, row
+
+
+def export_parquet(filename: str, out: str, partition: dict, batch_rows: int = EXPORT_BATCH_ROWS) -> int:
+    """Stream `filename` into the Parquet dataset at `out`; return the row count."""
+    sink = None
+    try:
+        for fieldnames, row in iter_rows(filename):
+            if sink is None:
+                sink = ParquetSink(out, fieldnames, partition=partition, append=True,
+                                   flush_rows=batch_rows, flush_seconds=float("inf"))
+            sink.write(row)
+    finally:
+        if sink is not None:
+            sink.close()
+    return sink.rows_written if sink else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export scraper CSV/JSONL output to partitioned Parquet.")
+    parser.add_argument("input", help="comments.csv, profiles_phone.csv or profiles_phone.jsonl")
+    parser.add_argument("--hashtag", default=None, help="Hashtag partition key of this file.")
+    parser.add_argument("--date", default=None, help="Date partition key, YYYY-MM-DD (default: today).")
+    parser.add_argument("--out", default=None,
+                        help="Dataset directory (default: the input file name without extension).")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS,
+                        help="Rows per Parquet part file.")
+    add_logging_args(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    out = args.out or os.path.splitext(args.input)[0]
+    rows = export_parquet(args.input, out, run_partition(args.hashtag, args.date), args.batch_rows)
+    logger.info("Exported %d rows from %s to %s/", rows, args.input, out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Request budget
+# ---------------------------
+
+# Starting requests per second for each endpoint. These replace the fixed
+# time.sleep(2) between posts and the 30-60 s wait between profiles.
+DEFAULT_POST_RATE = 0.5
+DEFAULT_PROFILE_RATE = 1 / 30
+DEFAULT_TAG_RATE = 0.5
+# Ceilings the rate may climb to while an endpoint keeps answering 200.
+DEFAULT_POST_RATE_MAX = 1.0
+DEFAULT_PROFILE_RATE_MAX = 1 / 15
+DEFAULT_TAG_RATE_MAX = 1.0
+
+# Endpoint names used with get_governor()
+GRAPHQL = "graphql"
+PROFILE = "profile"
+TAGS = "tags"
+
+
+def parse_retry_after(value: str) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RateGovernor:
+    """
+    Paces the requests to one endpoint and adapts the pace to the replies.
+
+    - Every request first calls wait() (or `await acquire()`), which spaces
+      requests 1/rate seconds apart (times 1..1+jitter), however many
+      workers share the governor.
+    - record(status, retry_after) feeds back each reply:
+        200       the rate grows by `increase` per success, up to `max_rate`;
+        429       the rate is halved (down to `min_rate`) and the endpoint
+                  pauses for Retry-After or the exponential backoff;
+        5xx/error the endpoint pauses for the exponential backoff
+                  (`backoff` * 2^n, capped at `max_backoff`).
+    - Circuit breaker: after `failure_threshold` failures in a row the
+      endpoint is paused for `cooldown` seconds (doubling up to
+      `max_cooldown` while it keeps failing); the first request after the
+      pause is the probe that closes it again.
+    """
+
+    def __init__(self, name: str, rate: float, max_rate: float = None, min_rate: float = None,
+                 jitter: float = 0.0, increase: float = 1.05, backoff: float = 2.0,
+                 max_backoff: float = 300.0, failure_threshold: int = 5, cooldown: float = 300.0,
+                 max_cooldown: float = 3600.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.name = name
+        self.rate = rate
+        self.max_rate = max(rate, max_rate or rate)
+        self.min_rate = min(rate, min_rate or rate / 8)
+        self.jitter = jitter
+        self.increase = increase
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0           # consecutive failed replies
+        self.throttled = 0          # 429 replies seen
+        self.circuit_opened = 0     # times the breaker opened
+        self._open_cooldown = cooldown
+        self._next_slot = 0.0       # monotonic time of the next free request slot
+        self._blocked_until = 0.0   # pause set by Retry-After / backoff / breaker
+
+    def _reserve(self) -> float:
+        """Claim the next request slot; return how long to wait for it."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._blocked_until)
+        interval = 1 / self.rate
+        if self.jitter:
+            interval *= 1 + random.random() * self.jitter
+        self._next_slot = slot + interval
+        return slot - now
+
+    def wait(self) -> float:
+        """Block until this endpoint may be requested again; return the seconds slept."""
+        slept = 0.0
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                time.sleep(delay)
+                slept += delay
+            # A pause set while we slept (429, breaker) applies to us too
+            if time.monotonic() >= self._blocked_until:
+                return slept
+
+    async def acquire(self) -> float:
+        """Async wait(): suspend until this endpoint may be requested again."""
+        slept = 0.0
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                slept += delay
+            if time.monotonic() >= self._blocked_until:
+                return slept
+
+    def _pause(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def record(self, status: int, retry_after: str = None):
+        """Feed back the status code (and Retry-After header) of a reply."""
+        if status == 429:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._failure(parse_retry_after(retry_after))
+        elif status >= 500:
+            self._failure(parse_retry_after(retry_after))
+        elif status < 400:
+            self.failures = 0
+            self._open_cooldown = self.cooldown
+            self.rate = min(self.max_rate, self.rate * self.increase)
+
+    def record_error(self):
+        """Feed back a request that failed without a reply (timeout, connection error)."""
+        self._failure(None)
+
+    def _failure(self, retry_after: float):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.circuit_opened += 1
+            delay = max(self._open_cooldown, retry_after or 0)
+            self._open_cooldown = min(self.max_cooldown, self._open_cooldown * 2)
+            logger.warning("%s: %d failures in a row, pausing requests for %.0f s.",
+                           self.name, self.failures, delay)
+        else:
+            backoff = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+            delay = max(backoff * (1 + random.random() / 2), retry_after or 0)
+            logger.info("%s: backing off %.1f s (rate now %.3f/s).", self.name, delay, self.rate)
+        self._pause(delay)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "throttled": self.throttled,
+            "circuit_opened": self.circuit_opened
+        }
+
+# ---------------------------
+# Shared governors
+# ---------------------------
+
+_DEFAULTS = {
+    GRAPHQL: {"rate": DEFAULT_POST_RATE, "max_rate": DEFAULT_POST_RATE_MAX},
+    # 1..2 x 30 s between profiles at the start, like the old uniform(30, 60) wait
+    PROFILE: {"rate": DEFAULT_PROFILE_RATE, "max_rate": DEFAULT_PROFILE_RATE_MAX, "jitter": 1.0},
+    TAGS: {"rate": DEFAULT_TAG_RATE, "max_rate": DEFAULT_TAG_RATE_MAX},
+}
+_governors = {}
+
+
+def get_governor(endpoint: str) -> RateGovernor:
+    """The process-wide governor of `endpoint`, created with the defaults on first use."""
+    if endpoint not in _governors:
+        _governors[endpoint] = RateGovernor(endpoint, **_DEFAULTS[endpoint])
+    return _governors[endpoint]
+
+
+def configure_governor(endpoint: str, rate: float = None, max_rate: float = None,
+                       **options) -> RateGovernor:
+    """Replace the governor of `endpoint` with one using the given budget."""
+    settings = dict(_DEFAULTS[endpoint], **options)
+    if rate is not None:
+        settings["rate"] = rate
+    if max_rate is not None:
+        settings["max_rate"] = max_rate
+    _governors[endpoint] = RateGovernor(endpoint, **settings)
+    return _governors[endpoint]
@@ -0,0 +1,62 @@
+import json
+import logging
+import sys
+
+# ---------------------------
+# Logging setup
+# ---------------------------
+#
+# Modules log through `logging.getLogger(__name__)`. Per-request details
+# (attempts, status codes, pages) are DEBUG, so at the default INFO level
+# hot loops skip formatting them entirely; run milestones are INFO.
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+LOG_FORMATS = ("text", "json")
+DEFAULT_LOG_LEVEL = "INFO"
+TEXT_FORMAT = "[%(levelname)s] %(message)s"
+
+# Libraries whose INFO/DEBUG output is not ours to show
+QUIET_LOGGERS = ("httpx", "httpcore", "hpack", "selenium", "urllib3", "asyncio")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message (and exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level: str = DEFAULT_LOG_LEVEL, fmt: str = "text", filename: str = None):
+    """Send every module's log records to stderr (or `filename`) at `level` and above."""
+    if filename:
+        handler = logging.FileHandler(filename, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonLinesFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+
+def add_logging_args(parser):
+    """Add --log-level, --log-format and --log-file to an argparse parser."""
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL,
+                        help="Minimum level of log messages (DEBUG shows every request).")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="text",
+                        help="'json' writes one JSON object per log record (JSON lines).")
+    parser.add_argument("--log-file", default=None,
+                        help="Write log messages to this file instead of stderr.")
+
+
+def setup_logging_from_args(args):
+    setup_logging(args.log_level, args.log_format, args.log_file)
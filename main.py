@@ -1,93 +1,393 @@
-import time
-import random
-import csv
-import httpx
+import argparse
+import asyncio
+import functools
+import logging
 
 # Import all utility functions from utils.py
 from utils import (
     get_hashtag_posts,
-    get_cookies_from_driver,
-    scrape_post,
-    extract_comment_usernames,
+    iter_hashtag_media,
+    get_shortcode,
+    get_post_url,
+    create_client,
+    iter_comments,
+    collect_comment_usernames,
     get_user_profile,
-    extract_phone_from_bio,
-    extract_email_from_bio,
-    extract_link_from_bio
+    FetchError
 )
+from async_pipeline import run_pipeline
+from governor import (
+    configure_governor,
+    GRAPHQL,
+    PROFILE,
+    DEFAULT_POST_RATE,
+    DEFAULT_PROFILE_RATE,
+    DEFAULT_POST_RATE_MAX,
+    DEFAULT_PROFILE_RATE_MAX
+)
+from profile_cache import ProfileCache, DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL
+from checkpoint import CheckpointJournal
+from crawl_index import (
+    CommentDelta,
+    CommentState,
+    CrawlIndex,
+    FeedPost,
+    select_new_posts,
+    DEFAULT_INDEX_PATH
+)
+from store import CrawlStore
+from metrics import get_registry, DEFAULT_METRICS_PATH
+from sinks import OUTPUT_FORMATS, open_sink, run_partition
+from session import BrowserSession, DEFAULT_COOKIE_JAR
+from logs import add_logging_args, setup_logging_from_args
+
+PROFILE_FIELDNAMES = ["post_url", "username", "biography", "phone_number", "email", "link"]
+PROGRESS_EVERY = 100  # users between INFO progress lines of the serial profile loop
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape commenter profiles for an Instagram hashtag.")
+    parser.add_argument("--discovery", choices=["http", "selenium"], default="http",
+                        help="How to find hashtag posts: plain HTTP feed paging (falls back to "
+                             "Selenium if it finds nothing) or Selenium page scrolling.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run post and profile fetching concurrently with asyncio.")
+    parser.add_argument("--post-rate", type=float, default=DEFAULT_POST_RATE,
+                        help="Starting GraphQL post requests per second.")
+    parser.add_argument("--profile-rate", type=float, default=DEFAULT_PROFILE_RATE,
+                        help="Starting profile requests per second.")
+    parser.add_argument("--post-rate-max", type=float, default=DEFAULT_POST_RATE_MAX,
+                        help="Ceiling the post request rate may climb to while Instagram answers 200.")
+    parser.add_argument("--profile-rate-max", type=float, default=DEFAULT_PROFILE_RATE_MAX,
+                        help="Ceiling the profile request rate may climb to while Instagram answers 200.")
+    parser.add_argument("--post-workers", type=int, default=2,
+                        help="Number of concurrent post fetchers (async mode).")
+    parser.add_argument("--profile-workers", type=int, default=4,
+                        help="Number of concurrent profile fetchers (async mode).")
+    parser.add_argument("--max-comments", type=int, default=None,
+                        help="Stop paging a post's comments after this many (default: all).")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file used to cache fetched profiles.")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL / 3600,
+                        help="Hours a cached profile stays valid (0 disables cache hits).")
+    parser.add_argument("--cookie-jar", default=DEFAULT_COOKIE_JAR,
+                        help="File where login cookies are stored and reused across runs.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="Output format: profiles_phone.csv / .jsonl, or a profiles_phone/ "
+                             "Parquet dataset partitioned by hashtag and date (needs pyarrow).")
+    parser.add_argument("--flush-rows", type=int, default=None,
+                        help="Write output in batches of this many rows (default: 100, 10000 for parquet).")
+    parser.add_argument("--flush-seconds", type=float, default=None,
+                        help="Also flush pending output rows after this many seconds "
+                             "(default: 5, 600 for parquet).")
+    parser.add_argument("--hashtags", default=None,
+                        help="Batch mode: file with one hashtag per line, scraped without prompts "
+                             "in one session with posts and users deduplicated across hashtags.")
+    parser.add_argument("--max-posts", type=int, default=50,
+                        help="Posts to scrape per hashtag in batch mode.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH,
+                        help="SQLite file remembering the posts processed per hashtag, so later "
+                             "runs only scrape new posts and posts that gained comments.")
+    parser.add_argument("--full-crawl", action="store_true",
+                        help="Ignore the crawl index and process every discovered post.")
+    parser.add_argument("--store", default=None,
+                        help="Also record posts, comments, profiles and contacts in this SQLite "
+                             "store (e.g. crawl.db), shared with comment_eng.py and phone2_eng.py.")
+    parser.add_argument("--metrics", default=DEFAULT_METRICS_PATH,
+                        help="JSON file the per-stage request metrics (latency histogram, status codes, "
+                             "retries, bytes, governor waits) are written to at the end of the run.")
+    parser.add_argument("--prometheus", default=None,
+                        help="Also write the metrics in Prometheus text format to this file, "
+                             "refreshed every minute during the run.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping posts and users in the journal.")
+    parser.add_argument("--journal", default="main_checkpoint.jsonl",
+                        help="Checkpoint journal file used by --resume.")
+    add_logging_args(parser)
+    return parser.parse_args()
+
+
+def read_hashtags(path: str) -> list:
+    """Hashtags listed one per line in `path` (leading '#' optional), without duplicates."""
+    hashtags = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            hashtag = line.strip().lstrip("#").strip()
+            if hashtag:
+                hashtags[hashtag] = None
+    return list(hashtags)
 
 
 def main():
-    # 1) User inputs: hashtag and number of posts
-    hashtag = input("[PROMPT] Enter hashtag (e.g. 保健品): ").strip()
-    max_posts = int(input("[PROMPT] Enter how many posts to scrape: "))
-
-    # 2) Fetch up to max_posts post URLs
-    print(f"[INFO] Fetching posts for #{hashtag} ...")
-    all_posts = get_hashtag_posts(hashtag, scroll_times=2)
-    if not all_posts:
-        print("[INFO] No posts found. Exiting.")
+    args = parse_args()
+    setup_logging_from_args(args)
+
+    journal = CheckpointJournal(args.journal, resume=args.resume)
+    # One pooled keep-alive client for every synchronous request of the run
+    client = create_client()
+    index = None if args.full_crawl else CrawlIndex(args.index)
+    store = CrawlStore(args.store) if args.store else None
+    metrics = get_registry()
+    if args.prometheus:
+        metrics.export_prometheus_every(args.prometheus)
+    # Serial mode paces each endpoint through these; the async pipeline configures its own
+    governors = [configure_governor(GRAPHQL, args.post_rate, args.post_rate_max),
+                 configure_governor(PROFILE, args.profile_rate, args.profile_rate_max)]
+    try:
+        collect_and_run(args, journal, client, index, store)
+    finally:
+        if index:
+            index.close()
+        if store:
+            store.close()
+        client.close()
+        journal.close()
+        logger.info("HTTP client: %s", client.stats.summary())
+        if not args.use_async:
+            for governor in governors:
+                logger.info("Rate governor %s: %s", governor.name, governor.stats())
+        metrics.finish(args.metrics)
+
+
+def discover_posts(args, hashtag, max_posts, client, session, index=None) -> list:
+    """
+    Up to `max_posts` post URLs of `hashtag`, via HTTP with Selenium as the
+    fallback. With a CrawlIndex, only posts that are new or gained comments
+    since the last run are returned.
+    """
+    logger.info("Fetching posts for #%s ...", hashtag)
+    posts, checked = [], 0
+    if args.discovery == "http":
+        posts, checked = select_new_posts(hashtag, iter_hashtag_media(hashtag, client),
+                                          max_posts, index)
+        if not checked:
+            logger.warning("HTTP discovery found no posts, falling back to Selenium.")
+    if not checked:
+        # The browser feed has no comment counts, so only unseen posts count as new
+        found = get_hashtag_posts(hashtag, target_posts=max_posts, driver=session.driver)
+        posts, _ = select_new_posts(hashtag, (FeedPost(get_shortcode(url), 0, None) for url in found),
+                                    max_posts, index, stop_after_seen=None)
+
+    post_urls = [get_post_url(post.shortcode) for post in posts]
+    logger.info("We have %d post URLs for #%s (limited to %d).", len(post_urls), hashtag, max_posts)
+    return post_urls
+
+
+def collect_and_run(args, journal, client, index=None, store=None):
+    previous_runs = journal.get_runs()
+    if args.hashtags:
+        hashtags = read_hashtags(args.hashtags)
+        logger.info("Batch of %d hashtags from %s.", len(hashtags), args.hashtags)
+    elif previous_runs:
+        hashtags = list(previous_runs)
+    else:
+        hashtags = None
+
+    # One browser at most for the whole run; usually none if the cookie jar is still valid
+    with BrowserSession(args.cookie_jar) as session:
+        logger.info("Retrieving cookies so we can call GraphQL / web_profile_info")
+        # Loaded into the client as well, which sends them with every request
+        cookies = session.get_cookies(client)
+
+        max_posts = args.max_posts
+        if hashtags is None:
+            # 1) User inputs: hashtag and number of posts
+            hashtags = [input("[PROMPT] Enter hashtag (e.g. 保健品): ").strip()]
+            max_posts = int(input("[PROMPT] Enter how many posts to scrape: "))
+
+        # 2) Fetch up to max_posts post URLs per hashtag. Posts found under several
+        # hashtags are queued once, under the first one.
+        runs = {}
+        post_hashtags = {}  # { post_url: first hashtag it was found under }
+        for hashtag in hashtags:
+            if hashtag in previous_runs:
+                # Reuse the post list of the interrupted run instead of rediscovering it
+                runs[hashtag] = previous_runs[hashtag]
+                logger.info("Resuming #%s with %d post URLs from the journal.", hashtag, len(runs[hashtag]))
+            else:
+                runs[hashtag] = discover_posts(args, hashtag, max_posts, client, session, index)
+                journal.mark_run(hashtag, runs[hashtag])
+            for post_url in runs[hashtag]:
+                post_hashtags.setdefault(post_url, hashtag)
+
+    post_urls = list(post_hashtags)
+    if store:
+        for post_url, tag in post_hashtags.items():
+            store.add_post(get_shortcode(post_url), post_url, tag)
+    if not post_urls:
+        logger.info("No new posts to process. Exiting.")
         return
+    if len(hashtags) > 1:
+        shared = sum(map(len, runs.values())) - len(post_urls)
+        logger.info("%d distinct posts across %d hashtags (%d found under more than one).",
+                    len(post_urls), len(hashtags), shared)
+
+    # A batch goes to one output; Parquet puts each row under the hashtag its post was found under first
+    cache = ProfileCache(args.cache, ttl=args.cache_ttl * 3600)
+    sink = open_sink("profiles_phone.csv", PROFILE_FIELDNAMES, fmt=args.format, append=args.resume,
+                     partition=run_partition(),
+                     partition_of=lambda row: {"hashtag": post_hashtags[row["post_url"]]},
+                     flush_rows=args.flush_rows, flush_seconds=args.flush_seconds)
+    try:
+        with sink:
+            run(args, post_urls, cookies, cache, journal, client, sink, index, store)
+        logger.info("All done! %d rows saved to %s", sink.rows_written, sink.filename)
+        if index:
+            # Posts whose comments were scraped are skipped next time unless they gain comments
+            for tag, tag_posts in runs.items():
+                index.mark_processed(tag, [get_shortcode(url) for url in tag_posts
+                                           if journal.post_usernames(url) is not None])
+            # ...and a revisit only fetches the comments newer than this run's
+            index.save_comment_states({
+                get_shortcode(url): CommentState(*journal.post_comment_state(url))
+                for url in post_urls if journal.post_comment_state(url)
+            })
+        if len(hashtags) > 1:
+            report_yields(runs, journal)
+    finally:
+        stats = cache.stats()
+        logger.info("Profile cache: %d hits, %d misses (%.0f%% hit rate).",
+                    stats["hits"], stats["misses"], stats["hit_rate"] * 100)
+        cache.close()
+
+
+def report_yields(runs: dict, journal):
+    """
+    Log what each hashtag of a batch contributed: its posts and commenters,
+    how many of them no earlier hashtag had, and how many of its commenters'
+    profiles had a phone number or email.
+    """
+    seen_posts, seen_users = set(), set()
+    for hashtag, post_urls in runs.items():
+        users = {}
+        for post_url in post_urls:
+            for username in journal.post_usernames(post_url) or ():
+                users[username] = None
+        new_posts = len(set(post_urls) - seen_posts)
+        new_users = len(users.keys() - seen_users)
+        contacts = 0
+        for username in users:
+            row = journal.user_row(username) or {}
+            if row.get("phone_number") or row.get("email"):
+                contacts += 1
+        logger.info("#%s: %d posts (%d new), %d commenters (%d new), %d with phone or email.",
+                    hashtag, len(post_urls), new_posts, len(users), new_users, contacts)
+        seen_posts.update(post_urls)
+        seen_users.update(users)
 
-    # If we found more than max_posts, slice
-    post_urls = all_posts[:max_posts]
-    print(f"[INFO] We have {len(post_urls)} post URLs (limited to {max_posts}).")
 
-    print("[INFO] Retrieving cookies so we can call GraphQL / web_profile_info")
-    cookies = get_cookies_from_driver()
+def record_comments(comments, store, shortcode: str):
+    """Pass Comment records through, saving each one to the store."""
+    for comment in comments:
+        store.add_comments(shortcode, (comment,))
+        yield comment
+
+
+def run(args, post_urls, cookies, cache, journal, client, sink, index=None, store=None):
+    if args.use_async:
+        logger.info("Running async pipeline (post rate %s/s, profile rate %.3f/s).",
+                    args.post_rate, args.profile_rate)
+        stats = asyncio.run(run_pipeline(
+            post_urls, cookies, sink,
+            post_rate=args.post_rate,
+            profile_rate=args.profile_rate,
+            post_rate_max=args.post_rate_max,
+            profile_rate_max=args.profile_rate_max,
+            post_workers=args.post_workers,
+            profile_workers=args.profile_workers,
+            max_comments=args.max_comments,
+            cache=cache,
+            journal=journal,
+            index=index,
+            store=store
+        ))
+        logger.info("%d unique users; deduplication saved %d profile requests.",
+                    stats["unique_users"], stats["requests_saved"])
+        logger.info("Async HTTP client: %s", stats["connections"])
+        for name, governor_stats in stats["governors"].items():
+            logger.info("Rate governor %s: %s", name, governor_stats)
+        return
 
     # 4) Gather commenter usernames from each post
-    post_to_usernames = {}  # { post_url: [username1, username2, ...] }
-    with httpx.Client() as client:
-        print(f"[INFO] Now scraping comment data from each of the {len(post_urls)} posts.")
-        for i, post_url in enumerate(post_urls, start=1):
-            print(f"[INFO] Processing post {i}/{len(post_urls)}: {post_url}")
-            post_json = scrape_post(post_url, cookies)
-            if not post_json:
-                print(f"[WARN] Failed to get post data for {post_url}")
+    user_to_posts = {}  # { username: [post_url1, post_url2, ...] }
+    total_pairs = 0
+    logger.info("Now scraping comment data from each of the %d posts.", len(post_urls))
+    for i, post_url in enumerate(post_urls, start=1):
+        commenters = journal.post_usernames(post_url)
+        if commenters is not None:
+            logger.debug("Post %d/%d already done: %s", i, len(post_urls), post_url)
+        else:
+            logger.info("Processing post %d/%d: %s", i, len(post_urls), post_url)
+            shortcode = get_shortcode(post_url)
+            delta = CommentDelta(index.comment_state(shortcode)) if index else None
+            comments = iter_comments(post_url, max_comments=args.max_comments, client=client, delta=delta)
+            if store:
+                comments = record_comments(comments, store, shortcode)
+            try:
+                commenters = collect_comment_usernames(comments)
+            except FetchError as e:
+                # Not journaled, so the post is scraped again by --resume or the next run
+                logger.error("Skipping %s: %s", post_url, e)
                 continue
-            commenters = extract_comment_usernames(post_json)
-            post_to_usernames[post_url] = commenters
-            time.sleep(2)
-
-    # 5) For each commenter, get profile, extract phone/email/link, and write to CSV
-    csv_filename = "profiles_phone.csv"
-    print(f"[INFO] Writing profile data to {csv_filename}")
-    with open(csv_filename, "w", newline='', encoding="utf-8") as f:
-        fieldnames = ["post_url", "username", "biography", "phone_number", "email", "link"]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-
-        with httpx.Client() as client:
-            for post_url, usernames in post_to_usernames.items():
-                print(f"[INFO] Found {len(usernames)} commenters for post: {post_url}")
-                for username in usernames:
-                    print(f"[INFO] Fetching user profile for {username}")
-                    profile_data = get_user_profile(username, client, cookies)
-                    if profile_data:
-                        biography = profile_data.get("biography", "")
-                        phone = extract_phone_from_bio(biography)
-                        email = extract_email_from_bio(biography)
-                        link = extract_link_from_bio(biography)
-
-                        row = {
-                            "post_url": post_url,
-                            "username": username,
-                            "biography": biography,
-                            "phone_number": phone,
-                            "email": email,
-                            "link": link
-                        }
-                        writer.writerow(row)
-                        f.flush()
-                        print(f"[INFO] Wrote profile data for {username}.")
-                    else:
-                        print(f"[WARN] Could not retrieve profile data for {username}")
-
-                    wait_time = random.uniform(30, 60)
-                    print(f"[INFO] Done with {username}, waiting {wait_time:.1f} seconds...")
-                    time.sleep(wait_time)
-
-    print(f"[INFO] All done! Results saved to {csv_filename}")
+            if store:
+                store.add_post(shortcode, post_url, scraped=True)
+            if delta is not None and delta.previous is not None:
+                logger.debug("Found %d new commenters on %s since the last visit", len(commenters), post_url)
+            elif not commenters:
+                # Still journaled (and indexed), so the post is not scraped again until it gains comments
+                logger.warning("No commenters found for %s", post_url)
+            else:
+                logger.debug("Found %d unique commenters on %s", len(commenters), post_url)
+            # Users finished before an interruption are skipped below, so their row for
+            # this newly scraped post is written now; the post is journaled once it is flushed
+            sink.write_many(
+                [{"post_url": post_url, **journal.user_row(username)}
+                 for username in commenters if journal.user_row(username)],
+                on_flush=functools.partial(journal.mark_post, post_url, commenters,
+                                           delta.state() if delta else None)
+            )
+        total_pairs += len(commenters)
+        for username in commenters:
+            user_to_posts.setdefault(username, []).append(post_url)
+
+    # Each user's profile is fetched once and fanned out to every post they commented on
+    saved = total_pairs - len(user_to_posts)
+    logger.info("%d (post, commenter) pairs, %d unique users; deduplication saves %d profile requests.",
+                total_pairs, len(user_to_posts), saved)
+
+    # 5) For each commenter, get profile, extract phone/email/link, and write to the output file
+    logger.info("Writing profile data to %s", sink.filename)
+    for i, (username, user_posts) in enumerate(user_to_posts.items(), start=1):
+        if journal.user_done(username):
+            continue
+        if i % PROGRESS_EVERY == 0:
+            logger.info("User %d/%d", i, len(user_to_posts))
+        logger.debug("User %d/%d: %s (commented on %d posts)", i, len(user_to_posts), username,
+                     len(user_posts))
+        # Cache hits cost no request, so they are not paced by the profile governor
+        profile = cache.get(username)
+        if profile is not None:
+            logger.debug("Using cached profile for %s", username)
+        else:
+            logger.debug("Fetching user profile for %s", username)
+            profile = get_user_profile(username, client)
+            if profile:
+                cache.put(username, profile)
+        if profile:
+            if store:
+                store.add_profile(profile)
+            fields = profile.contact_fields()
+
+            # Journaled only once the batch holding these rows is flushed
+            sink.write_many(
+                [{"post_url": post_url, **fields} for post_url in user_posts],
+                on_flush=functools.partial(journal.mark_user, username, fields)
+            )
+            logger.debug("Wrote profile data for %s.", username)
+        else:
+            logger.warning("Could not retrieve profile data for %s", username)
 
 
 if __name__ == "__main__":
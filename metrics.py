@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Per-stage metrics
+# ---------------------------
+
+# Request latency histogram bucket bounds, in seconds (Prometheus defaults up to 10 s,
+# plus the 30/60 s request timeouts)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_METRICS_PATH = "run_metrics.json"
+
+# Stage names used with get_stage()
+HASHTAG_POSTS = "get_hashtag_posts"
+SCRAPE_POST = "scrape_post"
+USER_PROFILE = "get_user_profile"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus layout) plus the max."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot: above every bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets": {str(bound): n for bound, n in zip(self.buckets + ("+Inf",), self.cumulative())}
+        }
+
+    def cumulative(self) -> list:
+        total, out = 0, []
+        for n in self.counts:
+            total += n
+            out.append(total)
+        return out
+
+
+class StageMetrics:
+    """
+    Counters of one request stage (e.g. get_user_profile): latency of every
+    request that got a reply, replies per status code, failed requests
+    without a reply, retries, bytes received and time spent waiting on the
+    rate governor.
+    """
+
+    def __init__(self, name: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.sleep_seconds = 0.0
+
+    def observe(self, seconds: float, status: int, nbytes: int = 0):
+        """Record one request that got a reply."""
+        self.latency.observe(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_received += nbytes
+        _registry.maybe_export()
+
+    def error(self, seconds: float = None):
+        """Record one request that failed without a reply (timeout, connection error)."""
+        self.errors += 1
+        if seconds is not None:
+            self.latency.observe(seconds)
+
+    def _sorted_statuses(self) -> list:
+        # Status codes are ints; a non-HTTP stage (Selenium) records a name instead
+        return sorted(self.statuses.items(), key=lambda item: str(item[0]))
+
+    def retry(self):
+        self.retries += 1
+
+    def slept(self, seconds: float):
+        self.sleep_seconds += seconds
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values()) + self.errors
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "statuses": {str(status): n for status, n in self._sorted_statuses()},
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_received": self.bytes_received,
+            "sleep_seconds": round(self.sleep_seconds, 3),
+            "latency_seconds": self.latency.to_dict()
+        }
+
+    def summary(self) -> str:
+        return (f"{self.requests} requests, statuses {self.statuses or '{}'}, {self.errors} errors, "
+                f"{self.retries} retries, {self.bytes_received / 2**20:.1f} MB, "
+                f"p50 {self.latency.quantile(0.5) * 1000:.0f} ms / p99 "
+                f"{self.latency.quantile(0.99) * 1000:.0f} ms, slept {self.sleep_seconds:.1f} s")
+
+# ---------------------------
+# Registry and exporters
+# ---------------------------
+
+
+def _write_atomic(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsRegistry:
+    """The stages of one process, and where/how often to export them."""
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.time()
+        self.prometheus_path = None
+        self.export_interval = None
+        self._last_export = time.monotonic()
+
+    def stage(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()}
+        }
+
+    def write_json(self, path: str = DEFAULT_METRICS_PATH):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def prometheus_text(self) -> str:
+        lines = []
+
+        def family(metric: str, kind: str, help_text: str):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        stages = sorted(self.stages.items())
+        family("scraper_requests_total", "counter", "Requests that got a reply, by stage and status.")
+        for name, stage in stages:
+            for status, n in stage._sorted_statuses():
+                lines.append(f'scraper_requests_total{{stage="{name}",status="{status}"}} {n}')
+        for metric, attr, help_text in (
+            ("scraper_request_errors_total", "errors", "Requests that failed without a reply."),
+            ("scraper_retries_total", "retries", "Retried requests."),
+            ("scraper_bytes_received_total", "bytes_received", "Response body bytes received."),
+            ("scraper_sleep_seconds_total", "sleep_seconds", "Seconds spent waiting on the rate governor."),
+        ):
+            family(metric, "counter", help_text)
+            for name, stage in stages:
+                lines.append(f'{metric}{{stage="{name}"}} {getattr(stage, attr)}')
+        family("scraper_request_duration_seconds", "histogram", "Request latency.")
+        for name, stage in stages:
+            hist = stage.latency
+            for bound, n in zip(hist.buckets + ("+Inf",), hist.cumulative()):
+                lines.append(f'scraper_request_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {n}')
+            lines.append(f'scraper_request_duration_seconds_sum{{stage="{name}"}} {hist.sum}')
+            lines.append(f'scraper_request_duration_seconds_count{{stage="{name}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+        _write_atomic(path, self.prometheus_text())
+
+    def export_prometheus_every(self, path: str, seconds: float = 60.0):
+        """Rewrite the Prometheus file at most every `seconds` while requests are recorded."""
+        self.prometheus_path = path
+        self.export_interval = seconds
+
+    def maybe_export(self):
+        if self.prometheus_path and time.monotonic() - self._last_export >= self.export_interval:
+            self._last_export = time.monotonic()
+            self.write_prometheus(self.prometheus_path)
+
+    def finish(self, json_path: str = DEFAULT_METRICS_PATH):
+        """Write the final JSON summary (and Prometheus file, if configured); log one line per stage."""
+        for name, stage in self.stages.items():
+            logger.info("Metrics %s: %s", name, stage.summary())
+        if json_path:
+            self.write_json(json_path)
+            logger.info("Metrics summary saved to %s", json_path)
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+
+_registry = MetricsRegistry()
+
+
+def get_stage(name: str) -> StageMetrics:
+    """The process-wide metrics of stage `name`, created on first use."""
+    return _registry.stage(name)
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
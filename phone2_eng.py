@@ -1,59 +1,32 @@
-import re
+import argparse
+import concurrent.futures
+import functools
 import csv
-import json
-import time
-import random
-import httpx
+import logging
+import os
 from urllib.parse import quote
 
-# Randomly select a User-Agent from the list
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Firefox/115.0",
-]
+from checkpoint import CheckpointJournal
+from sinks import OUTPUT_FORMATS, open_sink, output_filename, run_partition
+from contacts import PHONE_PATTERN, EMAIL_PATTERN, LINK_PATTERN
+from session import load_cookie_jar, DEFAULT_COOKIE_JAR
+from profiles import Profile
+from governor import get_governor, configure_governor, PROFILE, DEFAULT_PROFILE_RATE, DEFAULT_PROFILE_RATE_MAX
+from sharding import shard_of, part_filename, merge_parts
+from dedup import SpillDeduper, DEFAULT_CAPACITY
+from store import CrawlStore
+from metrics import get_registry, DEFAULT_METRICS_PATH
+from utils import create_client, get_user_profile
+from logs import add_logging_args, setup_logging_from_args
 
-def get_random_user_agent() -> str:
-    return random.choice(USER_AGENTS)
-
-def get_user_profile(username: str, client: httpx.Client, cookies: dict = None) -> dict:
-    """
-    Calls the Instagram API to get user information.
-    The returned data's "data" -> "user" contains the user's biography and other info.
-    If the request fails, it will retry 3 times.
-    """
-    url = f"https://i.instagram.com/api/v1/users/web_profile_info/?username={username}"
-    headers = {
-        "User-Agent": get_random_user_agent(),
-        "x-ig-app-id": "936619743392459",
-        "Accept": "application/json",
-        "Referer": "https://www.instagram.com/"
-    }
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = client.get(url, headers=headers, cookies=cookies, timeout=30.0)
-            if response.status_code == 200:
-                data = response.json()
-                # Uncomment the following line during debugging to view the complete JSON data returned
-                # print(f"{username} returned data:", json.dumps(data, indent=2, ensure_ascii=False))
-                return data.get("data", {}).get("user", {})
-            else:
-                print(f"[{username}] Request failed, status code: {response.status_code}")
-        except Exception as e:
-            print(f"[{username}] Error fetching information (attempt {attempt + 1}): {e}")
-        sleep_time = 2 + random.random() * 2
-        print(f"Waiting {sleep_time:.1f} seconds before retrying...")
-        time.sleep(sleep_time)
-    return {}
+logger = logging.getLogger(__name__)
 
 def extract_phone_from_bio(bio: str) -> str:
     """
     Uses a regular expression to match a phone number from the biography.
-    The matching pattern can be adjusted according to actual needs.
+    The matching pattern (PHONE_PATTERN in contacts.py) can be adjusted according to actual needs.
     """
-    phone_pattern = re.compile(r'(\+?\d[\d\s\-]{8,}\d)')
-    matches = phone_pattern.findall(bio)
+    matches = PHONE_PATTERN.findall(bio)
     if matches:
         return matches[0]
     return ""
@@ -62,8 +35,7 @@ def extract_email_from_bio(bio: str) -> str:
     """
     Uses a regular expression to match an email address from the biography.
     """
-    email_pattern = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
-    matches = email_pattern.findall(bio)
+    matches = EMAIL_PATTERN.findall(bio)
     if matches:
         return matches[0]
     return ""
@@ -72,78 +44,223 @@ def extract_link_from_bio(bio: str) -> str:
     """
     Uses a regular expression to match a link (URL) from the biography.
     """
-    link_pattern = re.compile(r'https?://[^\s]+')
-    matches = link_pattern.findall(bio)
+    matches = LINK_PATTERN.findall(bio)
     if matches:
         return matches[0]
     return ""
 
-def read_usernames_from_csv(filename: str) -> set:
+MAX_REPORTED_ROWS = 10  # malformed rows logged individually before only counting them
+
+def iter_usernames_from_csv(filename: str, shard: int = 0, shards: int = 1):
     """
-    Reads the usernames mentioned in comments from a CSV file.
-    Assumes the CSV file contains a column named "comment_username".
-    Returns a set of unique usernames.
+    Streams the unique usernames mentioned in comments from a CSV file,
+    in order of first appearance, so profile fetching can start with the
+    first row. Assumes the CSV file contains a column named "comment_username".
+    With shards > 1, only the usernames of `shard` are yielded.
+
+    Duplicates are dropped with a SpillDeduper (dedup.py), a Bloom filter
+    backed by an exact on-disk copy, so memory does not grow with the input.
+    Rows that cannot be parsed or have no username are reported and skipped.
     """
-    usernames = set()
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if "comment_username" in row and row["comment_username"]:
-                    usernames.add(row["comment_username"].strip())
-    except Exception as e:
-        print(f"Failed to read file {filename}: {e}")
-    return usernames
-
-def write_profiles_to_csv(profiles: list, filename: str):
+        f = open(filename, "r", newline='', encoding="utf-8")
+    except OSError as e:
+        logger.error("Failed to read file %s: %s", filename, e)
+        return
+    # Roughly one username per 20 bytes of input, so the filter is never too small
+    capacity = max(DEFAULT_CAPACITY // 10, os.path.getsize(filename) // 20)
+    malformed = 0
+    with f, SpillDeduper(capacity) as seen:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or "comment_username" not in reader.fieldnames:
+            logger.error("%s has no comment_username column (columns: %s)", filename, reader.fieldnames)
+            return
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except (csv.Error, UnicodeDecodeError) as e:
+                problem = str(e)
+                row = None
+            else:
+                username = (row.get("comment_username") or "").strip()
+                if None in row or not username:
+                    problem = "extra fields" if None in row else "no username"
+                    row = None
+            if row is None:
+                malformed += 1
+                if malformed <= MAX_REPORTED_ROWS:
+                    logger.warning("Skipping malformed row at line %d of %s: %s", reader.line_num, filename, problem)
+                continue
+            if shards > 1 and shard_of(username, shards) != shard:
+                continue
+            if seen.add(username):
+                yield username
+        logger.info("Read %d lines of %s: %d unique usernames, %d malformed rows skipped.",
+                    reader.line_num, filename, len(seen), malformed)
+
+def read_usernames_from_csv(filename: str, shard: int = 0, shards: int = 1) -> set:
     """
-    Saves the obtained user information to a CSV file,
-    including the fields: username, biography, phone_number, email, and link.
+    Reads the usernames mentioned in comments from a CSV file into a set.
+    Prefer iter_usernames_from_csv for large files.
     """
-    with open(filename, "w", newline='', encoding="utf-8") as f:
-        fieldnames = ["username", "biography", "phone_number", "email", "link"]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for profile in profiles:
-            writer.writerow({
-                "username": profile.get("username", ""),
-                "biography": profile.get("biography", ""),
-                "phone_number": profile.get("phone_number", ""),
-                "email": profile.get("email", ""),
-                "link": profile.get("link", "")
-            })
+    return set(iter_usernames_from_csv(filename, shard, shards))
 
-def main():
+PROFILE_FIELDNAMES = ["username", "biography", "phone_number", "email", "link"]
+
+def profile_to_row(profile: Profile) -> dict:
+    """
+    Selects the fields saved to the CSV file:
+    username, biography, phone_number, email, and link
+    (the contacts are extracted from the biography in one pass).
+    """
+    return profile.contact_fields()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch profiles and contact details for commenters in comments.csv.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping usernames already in the journal.")
+    parser.add_argument("--journal", default="phone2_checkpoint.jsonl",
+                        help="Checkpoint journal file used by --resume.")
+    parser.add_argument("--cookie-jar", default=DEFAULT_COOKIE_JAR,
+                        help="Cookie jar saved by main.py; used if present to stay logged in.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="Output format: profiles_phone.csv / .jsonl, or a profiles_phone/ "
+                             "Parquet dataset partitioned by hashtag and date (needs pyarrow).")
+    parser.add_argument("--flush-rows", type=int, default=None,
+                        help="Write output in batches of this many rows (default: 100, 10000 for parquet).")
+    parser.add_argument("--flush-seconds", type=float, default=None,
+                        help="Also flush pending output rows after this many seconds "
+                             "(default: 5, 600 for parquet).")
+    parser.add_argument("--profile-rate", type=float, default=DEFAULT_PROFILE_RATE,
+                        help="Starting profile requests per second.")
+    parser.add_argument("--profile-rate-max", type=float, default=DEFAULT_PROFILE_RATE_MAX,
+                        help="Ceiling the profile request rate may climb to while Instagram answers 200.")
+    parser.add_argument("--hashtag", default=None,
+                        help="Hashtag comments.csv was collected for; used as the Parquet partition key "
+                             "and, with --store, to only enrich that hashtag's commenters.")
+    parser.add_argument("--store", default=None,
+                        help="Read commenters from this SQLite store (crawl.db, written by comment_eng.py "
+                             "and main.py --store) instead of comments.csv, and save profiles into it.")
+    parser.add_argument("--metrics", default=DEFAULT_METRICS_PATH,
+                        help="JSON file the profile request metrics are written to at the end "
+                             "(one file per shard when sharded).")
+    parser.add_argument("--prometheus", default=None,
+                        help="Also write the metrics in Prometheus text format to this file, "
+                             "refreshed every minute.")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Split the usernames into this many shards by a stable hash. Without --shard, "
+                             "every shard runs in its own process and the part files are merged at the end.")
+    parser.add_argument("--shard", type=int, default=None,
+                        help="Only run this shard (0..shards-1), e.g. one per machine sharing the "
+                             "working directory; merge afterwards with --merge.")
+    parser.add_argument("--merge", action="store_true",
+                        help="Only merge the part files of a finished --shards run into the output.")
+    add_logging_args(parser)
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be between 0 and {args.shards - 1}")
+    return args
+
+def run_shard(args, shard: int = 0, shards: int = 1) -> int:
+    """
+    Fetch the profiles of one shard of comments.csv with its own client,
+    journal and output part file (the normal output when not sharded).
+    Returns the number of rows written.
+    """
     input_csv = "comments.csv"   # CSV file that contains the usernames mentioned in comments
-    output_csv = "profiles_phone.csv"  # CSV file to output user information (with phone number, email, and link)
-    
-    print("Reading usernames mentioned in comments...")
-    usernames = read_usernames_from_csv(input_csv)
-    print(f"Found {len(usernames)} unique usernames.")
-    
-    profiles = []
-    # If you have a login state Cookie, you can pass a valid Cookie dictionary; otherwise, set it to None
-    cookies = None
-    
-    with httpx.Client() as client:
-        for username in usernames:
-            print(f"Starting to fetch information for user {username}...")
-            profile = get_user_profile(username, client, cookies)
-            if profile:
-                bio = profile.get("biography", "")
-                phone = extract_phone_from_bio(bio)
-                email = extract_email_from_bio(bio)
-                link = extract_link_from_bio(bio)
-                profile["phone_number"] = phone
-                profile["email"] = email
-                profile["link"] = link
-                profiles.append(profile)
-            wait_time = random.uniform(30, 60)
-            print(f"Request completed, waiting {wait_time:.1f} seconds...")
-            time.sleep(wait_time)
-    
-    write_profiles_to_csv(profiles, output_csv)
-    print(f"User information saved to {output_csv}")
+    label = f"[shard {shard}/{shards}] " if shards > 1 else ""
+    metrics = get_registry()
+    metrics_file = part_filename(args.metrics, shard, shards) if shards > 1 else args.metrics
+    if args.prometheus:
+        metrics.export_prometheus_every(
+            part_filename(args.prometheus, shard, shards) if shards > 1 else args.prometheus)
+
+    # Usernames are streamed, so the first profile request does not wait for the whole file
+    store = CrawlStore(args.store) if args.store else None
+    if store:
+        logger.info("%sReading commenters from %s...", label, args.store)
+        usernames = (username for username in store.iter_commenters(args.hashtag)
+                     if shards == 1 or shard_of(username, shards) == shard)
+    else:
+        logger.info("%sReading usernames mentioned in comments...", label)
+        usernames = iter_usernames_from_csv(input_csv, shard, shards)
+
+    # Rows are streamed to the output in batches; a user is recorded in the journal once
+    # their row is flushed, so an interrupted run can be resumed with --resume
+    journal_file = part_filename(args.journal, shard, shards) if shards > 1 else args.journal
+    journal = CheckpointJournal(journal_file, resume=args.resume)
+    # Each shard process paces its own requests
+    configure_governor(PROFILE, args.profile_rate, args.profile_rate_max)
+    # Reuse the login cookies saved by main.py if available; otherwise request without login
+    cookies = load_cookie_jar(args.cookie_jar)
+    if cookies:
+        logger.info("%sLoaded %d cookies from %s.", label, len(cookies), args.cookie_jar)
+
+    # Output with user information (phone number, email, and link). Parquet shards
+    # write their own part files into the one dataset, so they need no merge.
+    output = "profiles_phone.csv"
+    if shards > 1 and args.format != "parquet":
+        output = part_filename(output, shard, shards)
+    sink = open_sink(output, PROFILE_FIELDNAMES, fmt=args.format, append=args.resume,
+                     partition=run_partition(args.hashtag),
+                     flush_rows=args.flush_rows, flush_seconds=args.flush_seconds)
+    try:
+        # One pooled keep-alive client per shard
+        with journal, sink, create_client(cookies=cookies) as client:
+            for username in usernames:
+                if journal.user_done(username):
+                    continue
+                logger.debug("%sStarting to fetch information for user %s...", label, username)
+                profile = get_user_profile(username, client)
+                if profile:
+                    if store:
+                        store.add_profile(profile)
+                    sink.write(profile_to_row(profile), on_flush=functools.partial(journal.mark_user, username))
+    finally:
+        if store:
+            store.close()
+        metrics.finish(metrics_file)
+
+    logger.info("%sUser information saved to %s", label, sink.filename)
+    logger.info("%sHTTP client: %s", label, client.stats.summary())
+    logger.info("%sProfile rate governor: %s", label, get_governor(PROFILE).stats())
+    return sink.rows_written
+
+def merge_shards(args):
+    """Merge the part files of every shard into profiles_phone.<format>."""
+    if args.format == "parquet":
+        logger.info("Parquet shards already write into %s/; nothing to merge.",
+                    output_filename("profiles_phone.csv", "parquet"))
+        return
+    output = output_filename("profiles_phone.csv", args.format)
+    try:
+        rows = merge_parts(output, PROFILE_FIELDNAMES, args.format, args.shards)
+    except FileNotFoundError as e:
+        logger.error("Cannot merge until every shard has run: %s", e)
+        return
+    logger.info("Merged %d shards: %d rows saved to %s", args.shards, rows, output)
+
+def main():
+    args = parse_args()
+    setup_logging_from_args(args)
+    if args.merge:
+        merge_shards(args)
+    elif args.shards == 1:
+        run_shard(args)
+    elif args.shard is not None:
+        run_shard(args, args.shard, args.shards)
+    else:
+        # One process per shard, each with its own client, journal and part file
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.shards, initializer=setup_logging_from_args,
+                                                    initargs=(args,)) as pool:
+            futures = [pool.submit(run_shard, args, shard, args.shards) for shard in range(args.shards)]
+            rows = [future.result() for future in futures]
+        logger.info("All %d shards done (%d rows written).", args.shards, sum(rows))
+        merge_shards(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import time
+
+from profiles import Profile
+
+# ---------------------------
+# Persistent profile cache
+# ---------------------------
+
+DEFAULT_CACHE_PATH = "profile_cache.db"
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # one week, in seconds
+
+
+class ProfileCache:
+    """
+    SQLite-backed cache of fetched profiles (the compact Profile fields as
+    JSON), keyed by username.
+    Entries older than `ttl` seconds are treated as misses, so repeated
+    hashtag runs only pay for users we have not seen recently.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " username TEXT PRIMARY KEY,"
+            " fetched_at REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, username: str) -> Profile:
+        """Return the cached Profile, or None if missing or expired."""
+        row = self.conn.execute(
+            "SELECT fetched_at, data FROM profiles WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Entries written before the compact record held the raw user JSON; both parse
+        return Profile.from_user_json(json.loads(row[1]), username)
+
+    def put(self, username: str, profile: Profile):
+        """Store a freshly fetched profile with the current timestamp."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO profiles (username, fetched_at, data) VALUES (?, ?, ?)",
+            (username, time.time(), json.dumps(profile.to_dict(), ensure_ascii=False))
+        )
+        self.conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,58 @@
+from contacts import extract_contacts
+
+# ---------------------------
+# Compact profile record
+# ---------------------------
+
+
+class Profile:
+    """
+    The part of a `web_profile_info` user object the pipeline uses.
+
+    The raw `data.user` JSON also carries timeline media, related profiles,
+    highlight reels etc. (tens of KB per user); only the fields below are
+    kept, in a __slots__ object, so the raw dict can be freed as soon as the
+    response is parsed.
+    """
+    __slots__ = ("username", "full_name", "biography", "external_url")
+
+    def __init__(self, username: str, full_name: str = "", biography: str = "", external_url: str = ""):
+        self.username = username
+        self.full_name = full_name
+        self.biography = biography
+        self.external_url = external_url
+
+    @classmethod
+    def from_user_json(cls, user: dict, username: str = ""):
+        """
+        Build a Profile from a raw `data.user` object (or a dict saved by
+        to_dict()). Returns None if `user` is empty.
+        """
+        if not user:
+            return None
+        return cls(
+            user.get("username") or username,
+            user.get("full_name") or "",
+            user.get("biography") or "",
+            user.get("external_url") or ""
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def contact_fields(self) -> dict:
+        """username, biography and the phone_number/email/link found in the bio."""
+        fields = {"username": self.username, "biography": self.biography}
+        fields.update(extract_contacts(self.biography))
+        return fields
+
+    def __eq__(self, other):
+        return isinstance(other, Profile) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Profile(username={self.username!r})"
+
+
+def parse_profile_response(data: dict, username: str = ""):
+    """Profile from a `web_profile_info` JSON reply, or None if it has no user."""
+    return Profile.from_user_json((data.get("data") or {}).get("user"), username)
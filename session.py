@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+
+import httpx
+
+from utils import (
+    INSTAGRAM_API_BASE,
+    get_profile_headers,
+    get_shared_client,
+    launch_chrome,
+    get_cookies_from_driver
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Cookie jar
+# ---------------------------
+
+DEFAULT_COOKIE_JAR = "instagram_cookies.json"
+# A cheap request that only succeeds for a logged-in session (public endpoints such
+# as web_profile_info also answer logged-out clients), used to check stored cookies.
+COOKIE_PROBE_URL = INSTAGRAM_API_BASE + "/api/v1/accounts/current_user/?edit=true"
+
+
+def load_cookie_jar(path: str = DEFAULT_COOKIE_JAR) -> dict:
+    """Return the cookies saved at `path`, or None if there is no jar yet."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning("Could not read cookie jar %s: %s", path, e)
+        return None
+
+
+def save_cookie_jar(cookies: dict, path: str = DEFAULT_COOKIE_JAR):
+    # Write to a temp file first so a crash never leaves a half-written jar
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cookies, f)
+    os.replace(tmp_path, path)
+
+
+def cookies_are_valid(client: httpx.Client) -> bool:
+    """Probe Instagram with the cookies of `client`; False if they are missing, rejected or logged out."""
+    if "sessionid" not in client.cookies:
+        return False
+    try:
+        response = client.get(COOKIE_PROBE_URL, headers=get_profile_headers(), timeout=15.0)
+    except Exception as e:
+        logger.warning("Cookie check failed: %s", e)
+        return False
+    # Rejected sessions are redirected to the login page or get 401/403 "login_required"
+    if response.status_code != 200 or "login" in str(response.url):
+        return False
+    try:
+        return bool(response.json().get("user"))
+    except ValueError:
+        return False
+
+# ---------------------------
+# Browser session
+# ---------------------------
+
+
+class BrowserSession:
+    """
+    Owns at most one Chrome instance per run and a persistent cookie jar.
+
+    get_cookies() returns the stored cookies when Instagram still accepts
+    them, so most runs never start a browser. Chrome is only launched when
+    the jar is missing or rejected, or when a caller needs `driver` (e.g.
+    Selenium hashtag discovery), and the same instance is then shared.
+    """
+
+    def __init__(self, cookie_jar: str = DEFAULT_COOKIE_JAR):
+        self.cookie_jar = cookie_jar
+        self._driver = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            logger.info("Launching Chrome (once for this run).")
+            self._driver = launch_chrome()
+        return self._driver
+
+    def get_cookies(self, client: httpx.Client = None) -> dict:
+        """
+        The stored cookies if still valid, else fresh ones from the browser.
+        They are loaded into `client` (by default the shared pooled client
+        of utils.py), which then sends them with every request.
+        """
+        cookies = load_cookie_jar(self.cookie_jar)
+        if client is None:
+            client = get_shared_client()
+        client.cookies = cookies or {}
+        if cookies_are_valid(client):
+            logger.info("Reusing %d cookies from %s.", len(cookies), self.cookie_jar)
+            return cookies
+        if cookies:
+            logger.warning("Stored cookies were rejected, refreshing them from the browser.")
+        cookies = self.refresh_cookies()
+        client.cookies = cookies
+        return cookies
+
+    def refresh_cookies(self) -> dict:
+        cookies = get_cookies_from_driver(self.driver)
+        save_cookie_jar(cookies, self.cookie_jar)
+        logger.info("Saved cookies to %s.", self.cookie_jar)
+        return cookies
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,58 @@
+import heapq
+import os
+import zlib
+
+from export import iter_rows
+from sinks import RowSink
+
+# ---------------------------
+# Sharded runs
+# ---------------------------
+#
+# A username list is split into N shards by a stable hash, so every process
+# (or machine sharing the filesystem) given the same N agrees on which shard
+# owns which user. Each shard writes its own part file and journal next to
+# the normal output; merge_parts() combines the parts into the normal
+# output, sorted by username so the result does not depend on which shard
+# finished first or in what order profiles were fetched.
+
+
+def shard_of(username: str, shards: int) -> int:
+    """The shard (0..shards-1) that owns `username`; the same in every process."""
+    return zlib.crc32(username.encode("utf-8")) % shards
+
+
+def part_filename(filename: str, shard: int, shards: int) -> str:
+    """profiles_phone.csv -> profiles_phone.part-1-of-4.csv"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.part-{shard}-of-{shards}{ext}"
+
+
+def sort_part(filename: str, fieldnames: list, fmt: str, key: str = "username") -> int:
+    """Rewrite one part file sorted by `key`; return its row count."""
+    rows = sorted((row for _, row in iter_rows(filename)), key=lambda row: row.get(key) or "")
+    tmp = filename + ".tmp"
+    with RowSink(tmp, fieldnames, fmt=fmt, flush_rows=len(rows) + 1) as sink:
+        sink.write_many(rows)
+    os.replace(tmp, filename)
+    return len(rows)
+
+
+def merge_parts(filename: str, fieldnames: list, fmt: str, shards: int, key: str = "username") -> int:
+    """
+    Merge the `shards` part files of `filename` into `filename`, sorted by
+    `key`. Parts are sorted one at a time and then merged streaming, so only
+    one part is held in memory. Raises FileNotFoundError if a part is missing.
+    Returns the number of rows written.
+    """
+    parts = [part_filename(filename, shard, shards) for shard in range(shards)]
+    missing = [part for part in parts if not os.path.exists(part)]
+    if missing:
+        raise FileNotFoundError(f"Shard output not found: {', '.join(missing)}")
+    for part in parts:
+        sort_part(part, fieldnames, fmt, key)
+    streams = [(row for _, row in iter_rows(part)) for part in parts]
+    with RowSink(filename, fieldnames, fmt=fmt) as sink:
+        for row in heapq.merge(*streams, key=lambda row: row.get(key) or ""):
+            sink.write(row)
+    return sink.rows_written
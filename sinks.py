@@ -0,0 +1,220 @@
+import csv
+import datetime
+import json
+import os
+import time
+from urllib.parse import quote
+
+# ---------------------------
+# Streaming output sink
+# ---------------------------
+
+DEFAULT_FLUSH_ROWS = 100
+DEFAULT_FLUSH_SECONDS = 5.0
+# Each Parquet flush is a complete part file, so batch far more rows per flush
+DEFAULT_PARQUET_FLUSH_ROWS = 10000
+DEFAULT_PARQUET_FLUSH_SECONDS = 600.0
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet")
+
+
+class RowSink:
+    """
+    Streams result rows to a CSV or JSON-lines file in batches.
+
+    Rows are buffered and written + flushed together once `flush_rows` rows
+    are pending or `flush_seconds` have passed since the last flush, so long
+    runs pay one write/flush per batch instead of per row, and never hold
+    more than one batch in memory.
+
+    `write(..., on_flush=callback)` runs the callback after the batch holding
+    those rows has reached the file; use it to record progress (e.g. a
+    checkpoint journal entry) only once the data is actually on disk.
+    """
+    formats = ("csv", "jsonl")
+
+    def __init__(self, filename: str, fieldnames: list, fmt: str = "csv", append: bool = False,
+                 flush_rows: int = DEFAULT_FLUSH_ROWS, flush_seconds: float = DEFAULT_FLUSH_SECONDS):
+        if fmt not in self.formats:
+            raise ValueError(f"Unknown output format {fmt!r}, expected one of {self.formats}")
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._buffer = []
+        self._callbacks = []
+        self._last_flush = time.monotonic()
+        self._open(append)
+
+    def _open(self, append: bool):
+        filename = self.filename
+        new_file = not append or not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.f = open(filename, "a" if append else "w", newline='', encoding="utf-8")
+        if self.fmt == "csv":
+            self._writer = csv.DictWriter(self.f, fieldnames=self.fieldnames, extrasaction="ignore")
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, row: dict, on_flush=None):
+        self.write_many([row], on_flush)
+
+    def write_many(self, rows: list, on_flush=None):
+        self._buffer.extend(rows)
+        if on_flush is not None:
+            self._callbacks.append(on_flush)
+        if (len(self._buffer) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def after_flush(self, callback):
+        """Run `callback` once every row written so far has been flushed."""
+        self.write_many([], callback)
+
+    def _write_batch(self, rows: list):
+        if self.fmt == "csv":
+            self._writer.writerows(rows)
+        else:
+            self.f.write("".join(
+                json.dumps({k: row.get(k, "") for k in self.fieldnames}, ensure_ascii=False) + "\n"
+                for row in rows
+            ))
+        self.f.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet output needs the 'pyarrow' package (pip install pyarrow).") from None
+    return pyarrow, pyarrow.parquet
+
+
+class ParquetSink(RowSink):
+    """
+    RowSink writing a Parquet dataset partitioned Hive-style by `partition`
+    (e.g. {"hashtag": ..., "date": ...}):
+
+        <root>/hashtag=<hashtag>/date=<YYYY-MM-DD>/part-<run>-<n>.parquet
+
+    Every column is stored as a typed (string) column. A Parquet file is only
+    readable once its footer is written, so each flush writes one complete
+    part file (atomically, through a temporary name) before the on_flush
+    callbacks run. Appending (e.g. --resume) just adds new part files.
+
+    `partition_of(row)` adds per-row partition keys in front of the fixed
+    ones (e.g. {"hashtag": ...} for a batch of several hashtags); each flush
+    then writes one part file per partition its rows fall into.
+    Readers such as pyarrow.parquet.read_table(root, columns=[...]) or
+    pandas/duckdb pick the partition keys up as columns.
+    """
+    formats = ("parquet",)
+
+    def __init__(self, root: str, fieldnames: list, partition: dict = None, append: bool = False,
+                 flush_rows: int = DEFAULT_PARQUET_FLUSH_ROWS,
+                 flush_seconds: float = DEFAULT_PARQUET_FLUSH_SECONDS, compression: str = "zstd",
+                 partition_of=None):
+        self.partition = partition or {}
+        self.partition_of = partition_of
+        self.compression = compression
+        super().__init__(root, fieldnames, fmt="parquet", append=append,
+                         flush_rows=flush_rows, flush_seconds=flush_seconds)
+
+    def _open(self, append: bool):
+        self.pa, self.pq = _require_pyarrow()
+        self.schema = self.pa.schema([(name, self.pa.string()) for name in self.fieldnames])
+        self.directory = self._partition_directory(self.partition)
+        self._run_id = datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self._parts = 0
+        self._closed = False
+
+    def _partition_directory(self, partition: dict) -> str:
+        # Partition values may contain '/', spaces or non-ASCII text; readers URI-decode them
+        directory = os.path.join(self.filename, *(
+            f"{key}={quote(str(value), safe='')}" for key, value in partition.items()
+        ))
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _write_batch(self, rows: list):
+        if self.partition_of is None:
+            self._write_part(self.directory, rows)
+            return
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(self.partition_of(row).items()), []).append(row)
+        for keys, group in groups.items():
+            self._write_part(self._partition_directory({**dict(keys), **self.partition}), group)
+
+    def _write_part(self, directory: str, rows: list):
+        columns = {
+            name: [None if row.get(name) is None else str(row[name]) for row in rows]
+            for name in self.fieldnames
+        }
+        table = self.pa.Table.from_pydict(columns, schema=self.schema)
+        path = os.path.join(directory, f"part-{self._run_id}-{self._parts:05d}.parquet")
+        tmp_path = path + ".tmp"
+        self.pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+        self._parts += 1
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            self._closed = True
+
+
+def open_sink(base: str, fieldnames: list, fmt: str = "csv", append: bool = False, partition: dict = None,
+              flush_rows: int = None, flush_seconds: float = None, partition_of=None) -> RowSink:
+    """
+    Open the sink for `fmt` at output_filename(base, fmt). `partition` and
+    `partition_of` are only used by Parquet; unset flush limits use the
+    format's defaults.
+    """
+    output = output_filename(base, fmt)
+    if fmt == "parquet":
+        return ParquetSink(output, fieldnames, partition=partition, append=append,
+                           flush_rows=flush_rows or DEFAULT_PARQUET_FLUSH_ROWS,
+                           flush_seconds=flush_seconds or DEFAULT_PARQUET_FLUSH_SECONDS,
+                           partition_of=partition_of)
+    return RowSink(output, fieldnames, fmt=fmt, append=append,
+                   flush_rows=flush_rows or DEFAULT_FLUSH_ROWS,
+                   flush_seconds=flush_seconds or DEFAULT_FLUSH_SECONDS)
+
+
+def run_partition(hashtag: str = None, date: str = None) -> dict:
+    """Partition keys of a run's output: its hashtag (if known) and date (default: today)."""
+    partition = {"hashtag": hashtag} if hashtag else {}
+    partition["date"] = date or datetime.date.today().isoformat()
+    return partition
+
+
+def output_filename(base: str, fmt: str) -> str:
+    """
+    Swap the extension of `base` (e.g. profiles_phone.csv) to match `fmt`.
+    Parquet output is a dataset directory named after the stem (profiles_phone/).
+    """
+    stem = os.path.splitext(base)[0]
+    return stem if fmt == "parquet" else stem + "." + fmt
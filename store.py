@@ -0,0 +1,192 @@
+import sqlite3
+import time
+
+from profiles import Profile
+
+# ---------------------------
+# Shared crawl store
+# ---------------------------
+
+DEFAULT_STORE_PATH = "crawl.db"
+DEFAULT_BATCH_ROWS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    shortcode TEXT PRIMARY KEY,
+    post_url TEXT NOT NULL,
+    hashtag TEXT,
+    scraped_at REAL
+);
+CREATE INDEX IF NOT EXISTS posts_hashtag ON posts (hashtag);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    shortcode TEXT NOT NULL,
+    username TEXT NOT NULL,
+    text TEXT,
+    created_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS comments_shortcode ON comments (shortcode);
+CREATE INDEX IF NOT EXISTS comments_username ON comments (username, shortcode);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    full_name TEXT,
+    biography TEXT,
+    external_url TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    username TEXT PRIMARY KEY,
+    phone_number TEXT,
+    email TEXT,
+    link TEXT
+);
+"""
+
+_INSERTS = {
+    "posts": "INSERT INTO posts (shortcode, post_url, hashtag, scraped_at) VALUES (?, ?, ?, ?)"
+             " ON CONFLICT (shortcode) DO UPDATE SET"
+             " hashtag = COALESCE(posts.hashtag, excluded.hashtag),"
+             " scraped_at = COALESCE(excluded.scraped_at, posts.scraped_at)",
+    "comments": "INSERT OR IGNORE INTO comments (id, shortcode, username, text, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+    "users": "INSERT OR REPLACE INTO users (username, full_name, biography, external_url, fetched_at)"
+             " VALUES (?, ?, ?, ?, ?)",
+    "contacts": "INSERT OR REPLACE INTO contacts (username, phone_number, email, link) VALUES (?, ?, ?, ?)",
+}
+
+
+class CrawlStore:
+    """
+    Embedded SQLite database the scraping stages share instead of handing
+    CSV files to each other: posts, their comments, the commenters' profiles
+    (users) and the contacts extracted from them.
+
+    Writes are buffered and committed `batch_rows` at a time in one
+    transaction; the database runs in WAL mode, so readers (another stage,
+    an analysis query) are not blocked by a running crawl and several
+    processes can write to it. Reads flush pending writes first.
+    Comments are indexed by shortcode and by username, so "who commented on
+    this post" and "which posts did this user comment on" are index lookups.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, batch_rows: int = DEFAULT_BATCH_ROWS):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.conn = sqlite3.connect(path, timeout=60.0)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pending = {table: [] for table in _INSERTS}
+        self._pending_rows = 0
+
+    # -- writes --
+
+    def _add(self, table: str, rows: list):
+        self._pending[table].extend(rows)
+        self._pending_rows += len(rows)
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def add_post(self, shortcode: str, post_url: str, hashtag: str = None, scraped: bool = False):
+        """Record a post (and the hashtag it was found under; the first one is kept)."""
+        self._add("posts", [(shortcode, post_url, hashtag, time.time() if scraped else None)])
+
+    def add_comments(self, shortcode: str, comments):
+        """Record Comment records (decoding.py) of a post; known comment ids are ignored."""
+        self._add("comments", [
+            (comment.id or f"{shortcode}/{comment.username}", shortcode, comment.username,
+             comment.text, comment.created_at)
+            for comment in comments if comment.username
+        ])
+
+    def add_profile(self, profile: Profile):
+        """Record a fetched profile and the contacts extracted from its biography."""
+        fields = profile.contact_fields()
+        self._add("users", [(profile.username, profile.full_name, profile.biography,
+                             profile.external_url, time.time())])
+        self._add("contacts", [(profile.username, fields["phone_number"], fields["email"],
+                                fields["link"])])
+
+    def flush(self):
+        """Commit every pending row in one transaction."""
+        if not self._pending_rows:
+            return
+        with self.conn:
+            for table, rows in self._pending.items():
+                if rows:
+                    self.conn.executemany(_INSERTS[table], rows)
+        self._pending = {table: [] for table in _INSERTS}
+        self._pending_rows = 0
+
+    # -- reads --
+
+    def iter_commenters(self, hashtag: str = None, page_rows: int = 10000):
+        """
+        Yield every distinct commenter username (of posts under `hashtag` if
+        given), in username order. Reads page by page along the username
+        index, so no cursor stays open while the caller writes.
+        """
+        self.flush()
+        if hashtag is None:
+            query = ("SELECT DISTINCT username FROM comments WHERE username > ?"
+                     " ORDER BY username LIMIT ?")
+            params = ()
+        else:
+            query = ("SELECT DISTINCT c.username FROM comments c JOIN posts p ON p.shortcode = c.shortcode"
+                     " WHERE c.username > ? AND p.hashtag = ? ORDER BY c.username LIMIT ?")
+            params = (hashtag,)
+        last = ""
+        while True:
+            page = [row[0] for row in self.conn.execute(query, (last, *params, page_rows))]
+            yield from page
+            if len(page) < page_rows:
+                return
+            last = page[-1]
+
+    def post_commenters(self, shortcode: str) -> list:
+        """Distinct usernames that commented on a post."""
+        self.flush()
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT username FROM comments WHERE shortcode = ?", (shortcode,))]
+
+    def user_posts(self, username: str) -> list:
+        """URLs of the posts a user commented on."""
+        self.flush()
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT p.post_url FROM comments c JOIN posts p ON p.shortcode = c.shortcode"
+            " WHERE c.username = ?", (username,))]
+
+    def profile(self, username: str) -> Profile:
+        """The stored Profile of a user, or None."""
+        self.flush()
+        row = self.conn.execute(
+            "SELECT username, full_name, biography, external_url FROM users WHERE username = ?",
+            (username,)
+        ).fetchone()
+        return Profile(*row) if row else None
+
+    def contact_rows(self, hashtag: str = None):
+        """
+        Yield (post_url, username, biography, phone_number, email, link) rows,
+        one per post and commenter with a stored profile (main.py's output).
+        """
+        self.flush()
+        query = ("SELECT DISTINCT p.post_url, u.username, u.biography, k.phone_number, k.email, k.link"
+                 " FROM comments c JOIN posts p ON p.shortcode = c.shortcode"
+                 " JOIN users u ON u.username = c.username"
+                 " JOIN contacts k ON k.username = c.username")
+        params = ()
+        if hashtag is not None:
+            query += " WHERE p.hashtag = ?"
+            params = (hashtag,)
+        yield from self.conn.execute(query, params)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
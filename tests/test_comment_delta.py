@@ -0,0 +1,163 @@
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+import utils
+from crawl_index import CommentDelta, CommentState
+from decoding import Comment, CommentPage
+from governor import GRAPHQL, configure_governor
+
+
+def comment(i: int, created_at: int = None) -> Comment:
+    return Comment(f"c{i}", f"user{i}", "text", 1000 + i if created_at is None else created_at)
+
+
+def page(comments: list, count: int, end_cursor: str = None) -> CommentPage:
+    return CommentPage(comments, count, end_cursor)
+
+
+def visit(delta: CommentDelta, pages: dict) -> list:
+    """Page through `pages` ({after: CommentPage}) the way iter_comments does."""
+    after = delta.resume_from
+    out = []
+    while True:
+        current = pages[after]
+        more = delta.observe_page(after, current)
+        for c in current.comments:
+            if delta.is_new(c):
+                delta.seen(c)
+                out.append(c.id)
+        after = current.end_cursor
+        if after is None or not more:
+            return out
+
+
+# ---------------------------
+# CommentDelta
+# ---------------------------
+
+def test_first_visit_yields_everything_and_records_the_newest():
+    delta = CommentDelta()
+    pages = {None: page([comment(0), comment(1)], 3, "p2"), "p2": page([comment(2)], 3)}
+    assert visit(delta, pages) == ["c0", "c1", "c2"]
+    assert delta.state() == CommentState(3, ("c2",), 1002, "p2")
+
+
+def test_oldest_first_revisit_resumes_at_the_last_page():
+    previous = CommentState(3, ("c2",), 1002, "p2")
+    delta = CommentDelta(previous)
+    assert delta.resume_from == "p2"
+    pages = {"p2": page([comment(2), comment(3)], 4)}
+    assert visit(delta, pages) == ["c3"]
+    assert delta.state() == CommentState(4, ("c3",), 1003, "p2")
+
+
+def test_same_second_comment_is_not_lost():
+    previous = CommentState(3, ("c2",), 1002, "p2")
+    delta = CommentDelta(previous)
+    tie = comment(3, created_at=1002)
+    assert delta.is_new(tie)
+    assert not delta.is_new(comment(2))
+    assert not delta.is_new(comment(1))
+
+
+def test_same_second_comments_already_seen_are_not_yielded_again():
+    # The first visit ended with two comments in its newest second
+    first = CommentDelta()
+    pages = {None: page([comment(1), comment(2, created_at=1001), comment(3, created_at=1001)], 3)}
+    assert visit(first, pages) == ["c1", "c2", "c3"]
+    assert first.state() == CommentState(3, ("c1", "c2", "c3"), 1001, None)
+
+    delta = CommentDelta(first.state())
+    pages = {None: page([comment(1), comment(2, created_at=1001), comment(3, created_at=1001),
+                         comment(4, created_at=1001)], 4)}
+    assert visit(delta, pages) == ["c4"]
+    assert delta.state() == CommentState(4, ("c1", "c2", "c3", "c4"), 1001, None)
+
+
+def test_newest_first_revisit_stops_at_the_first_seen_comment():
+    previous = CommentState(3, ("c2",), 1002, None)
+    delta = CommentDelta(previous)
+    pages = {
+        None: page([comment(5), comment(4)], 6, "p2"),
+        "p2": page([comment(3), comment(2)], 6, "p3"),
+        "p3": page([comment(1), comment(0)], 6),
+    }
+    assert visit(delta, pages) == ["c5", "c4", "c3"]
+    # New comments appear on the first page, so the next visit starts there again
+    assert delta.state() == CommentState(6, ("c5",), 1005, None)
+
+
+def test_rejected_cursor_only_for_an_empty_reply_to_the_resume_cursor():
+    delta = CommentDelta(CommentState(3, ("c2",), 1002, "p2"))
+    assert delta.cursor_rejected("p2", page([], 0))
+    assert not delta.cursor_rejected("p2", page([], 3))
+    assert not delta.cursor_rejected("p3", page([], 0))
+    delta.restart()
+    assert delta.resume_from is None and delta.resume_cursor is None
+    assert not delta.cursor_rejected(None, page([], 0))
+
+# ---------------------------
+# iter_comments with a delta
+# ---------------------------
+
+
+@pytest.fixture
+def graphql_server():
+    """A fake GraphQL endpoint with 5 oldest-first comments in pages of 2; cursors are offsets."""
+    configure_governor(GRAPHQL, 1000, 1000, backoff=0.01, jitter=0.0)
+    calls, failures = [], set()
+
+    def handler(request):
+        variables = json.loads(parse_qs(request.content.decode())["variables"][0])
+        calls.append(variables["after"])
+        if len(calls) in failures:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"status": "fail"})
+        if variables["after"] == "expired":
+            return httpx.Response(200, json={"data": {"shortcode_media": None}})
+        start = int(variables["after"] or 0)
+        end = min(start + variables["first"], 5)
+        edges = [{"node": {"id": f"c{i}", "text": "", "created_at": 1000 + i,
+                           "owner": {"username": f"user{i}"}}} for i in range(start, end)]
+        return httpx.Response(200, json={"data": {"shortcode_media": {"edge_media_to_parent_comment": {
+            "count": 5, "edges": edges,
+            "page_info": {"has_next_page": end < 5, "end_cursor": str(end) if end < 5 else None}
+        }}}})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    yield client, calls, failures
+    client.close()
+
+
+def test_revisit_fetches_only_from_the_resume_cursor(graphql_server):
+    client, calls, _ = graphql_server
+    delta = CommentDelta(CommentState(5, ("c2",), 1002, "2"))
+    got = [c.id for c in utils.iter_comments("P", page_size=2, client=client, delta=delta)]
+    assert got == ["c3", "c4"]
+    assert calls == ["2", "4"]
+
+
+def test_transient_failure_on_the_resume_cursor_is_retried_not_restarted(graphql_server):
+    client, calls, failures = graphql_server
+    failures.add(1)
+    delta = CommentDelta(CommentState(5, ("c2",), 1002, "2"))
+    got = [c.id for c in utils.iter_comments("P", page_size=2, client=client, delta=delta)]
+    assert got == ["c3", "c4"]
+    assert calls == ["2", "2", "4"]
+
+
+def test_expired_cursor_restarts_from_the_first_page(graphql_server):
+    client, calls, _ = graphql_server
+    delta = CommentDelta(CommentState(5, ("c2",), 1002, "expired"))
+    got = [c.id for c in utils.iter_comments("P", page_size=2, client=client, delta=delta)]
+    assert got == ["c3", "c4"]
+    assert calls == ["expired", None, "2", "4"]
+
+
+def test_page_that_keeps_failing_raises_instead_of_ending_the_post(graphql_server):
+    client, calls, failures = graphql_server
+    failures.update({2, 3, 4})
+    with pytest.raises(utils.FetchError):
+        list(utils.iter_comments("P", page_size=2, client=client))
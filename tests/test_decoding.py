@@ -0,0 +1,16 @@
+import json
+
+from decoding import Comment, decode_comment_page
+
+
+def post_reply(comment_id) -> bytes:
+    node = {"id": comment_id, "text": "hi", "created_at": 1000, "owner": {"username": "user0"}}
+    return json.dumps({"data": {"shortcode_media": {"edge_media_to_parent_comment": {
+        "count": 1, "edges": [{"node": node}], "page_info": {"has_next_page": False, "end_cursor": None}
+    }}}}).encode()
+
+
+def test_numeric_and_string_comment_ids_decode_to_the_same_comment():
+    expected = Comment("17900000000000001", "user0", "hi", 1000)
+    assert decode_comment_page(post_reply("17900000000000001")).comments == [expected]
+    assert decode_comment_page(post_reply(17900000000000001)).comments == [expected]
@@ -1,21 +1,53 @@
 import time
 import random
-import re
 import json
 import csv
+import logging
+import os
 from urllib.parse import quote
 
 import httpx
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+
+try:
+    # Only needed for browser login and Selenium discovery, so the HTTP-only
+    # scripts (phone2_eng.py) can share this module without it
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+except ImportError:
+    webdriver = None
+
+from contacts import PHONE_PATTERN, EMAIL_PATTERN, LINK_PATTERN
+from profiles import Profile
+from governor import get_governor, GRAPHQL, PROFILE, TAGS
+from metrics import get_stage, HASHTAG_POSTS, SCRAPE_POST, USER_PROFILE
+from crawl_index import CommentDelta, FeedPost
+from decoding import (
+    CommentPage,
+    loads,
+    comment_page_from_media,
+    decode_comment_page,
+    decode_profile
+)
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------
 # Constants
 # ---------------------------
 INSTAGRAM_QUERY_HASH = "97b41c52301f77ce508f55e66d17620e"
+# API hosts can be overridden through the environment, e.g. to run against
+# the local mock server in benchmarks/mock_instagram.py.
+INSTAGRAM_WEB_BASE = os.environ.get("INSTAGRAM_WEB_BASE", "https://www.instagram.com")
+INSTAGRAM_API_BASE = os.environ.get("INSTAGRAM_API_BASE", "https://i.instagram.com")
+INSTAGRAM_GRAPHQL_URL = INSTAGRAM_WEB_BASE + "/graphql/query"
+PROFILE_INFO_URL = INSTAGRAM_API_BASE + "/api/v1/users/web_profile_info/?username={username}"
+HASHTAG_SECTIONS_URL = INSTAGRAM_API_BASE + "/api/v1/tags/{hashtag}/sections/"
+INSTAGRAM_APP_ID = "936619743392459"
+# Attempts per request before giving up (failed requests, non-200 replies, bad JSON)
+REQUEST_RETRIES = 3
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
@@ -27,213 +59,513 @@ def get_random_user_agent() -> str:
     """Return a random User-Agent string from our short list."""
     return random.choice(USER_AGENTS)
 
+def get_shortcode(url_or_shortcode: str) -> str:
+    """Accept either a full post URL or a bare shortcode and return the shortcode."""
+    if "http" in url_or_shortcode:
+        return url_or_shortcode.split("/p/")[-1].split("/")[0]
+    return url_or_shortcode
+
+def get_post_url(shortcode: str) -> str:
+    return f"https://www.instagram.com/p/{shortcode}/"
+
+def build_post_query(shortcode: str, first: int = 50, after: str = None) -> str:
+    """Build the form-encoded GraphQL body for a post/comments query."""
+    variables = json.dumps({
+        "shortcode": shortcode,
+        "first": first,  # how many comments to retrieve
+        "after": after
+    }, separators=(',', ':'))
+    return f"query_hash={INSTAGRAM_QUERY_HASH}&variables={quote(variables)}"
+
+def get_graphql_headers() -> dict:
+    return {
+        "content-type": "application/x-www-form-urlencoded",
+        "User-Agent": get_random_user_agent()
+    }
+
+def get_profile_headers() -> dict:
+    return {
+        "User-Agent": get_random_user_agent(),
+        "x-ig-app-id": INSTAGRAM_APP_ID,
+        "Accept": "application/json",
+        "Referer": "https://www.instagram.com/"
+    }
+
 # ---------------------------
-# Selenium-based Functions
+# Pooled HTTP client
 # ---------------------------
 
-def get_hashtag_posts(hashtag: str, scroll_times=2):
+# Connection pool settings shared by every request we make.
+POOL_MAX_CONNECTIONS = 20
+POOL_MAX_KEEPALIVE = 10
+POOL_KEEPALIVE_EXPIRY = 30.0
+
+
+class ConnectionStats:
     """
-    Use Selenium to open the hashtag page, scroll a bit,
-    and collect up to `scroll_times` worth of post URLs.
+    Counts requests and newly opened TCP connections for a client, using
+    httpcore's trace hook, so we can report how often connections were reused.
     """
-    encoded_hashtag = quote(hashtag)
-    url = f"https://www.instagram.com/explore/tags/{encoded_hashtag}/"
 
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.new_connections / self.requests)
+
+    def _on_trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def _on_trace_async(self, event_name: str, info: dict):
+        self._on_trace(event_name, info)
+
+    def _on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self._on_trace
+
+    async def _on_request_async(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self._on_trace_async
+
+    def summary(self) -> str:
+        return (f"{self.requests} requests over {self.new_connections} connections "
+                f"({self.reuse_ratio:.0%} reused)")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_client(cookies: dict = None, http2: bool = True, use_async: bool = False,
+                  max_connections: int = POOL_MAX_CONNECTIONS,
+                  max_keepalive: int = POOL_MAX_KEEPALIVE,
+                  keepalive_expiry: float = POOL_KEEPALIVE_EXPIRY):
+    """
+    Build the single pooled, keep-alive httpx client (or AsyncClient) that all
+    network calls of a run should share. HTTP/2 is used when the optional `h2`
+    package is installed. The client's ConnectionStats is at `client.stats`.
+    """
+    if http2 and not _http2_available():
+        logger.info("Package 'h2' not installed, using HTTP/1.1 (pip install httpx[http2]).")
+        http2 = False
+    stats = ConnectionStats()
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry
+    )
+    client_class = httpx.AsyncClient if use_async else httpx.Client
+    hook = stats._on_request_async if use_async else stats._on_request
+    client = client_class(
+        cookies=cookies,
+        http2=http2,
+        limits=limits,
+        event_hooks={"request": [hook]}
+    )
+    client.stats = stats
+    return client
+
+
+_shared_client = None
+
+def get_shared_client() -> httpx.Client:
+    """Return a process-wide pooled client for callers that don't pass their own."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = create_client()
+    return _shared_client
+
+# ---------------------------
+# Selenium-based Functions
+# ---------------------------
+
+# Adjust these for your Chrome profile
+CHROME_USER_DATA_DIR = "/Users/xuhuirong/Library/Application Support/Google/Chrome"
+CHROME_PROFILE_DIRECTORY = "Person 2"
+
+def launch_chrome():
+    """Start Chrome with the logged-in Instagram profile."""
+    if webdriver is None:
+        raise RuntimeError("Browser login and discovery need the 'selenium' package (pip install selenium).")
     options = Options()
     # If you want to run headless, uncomment:
     # options.add_argument("--headless")
-    
-    # Adjust these paths for your Chrome profile if desired
-    #options.add_argument("user-data-dir=/Users/xuhuirong/Library/Application Support/Google/Chrome")
-    #options.add_argument("--profile-directory=Person 2")
-
-    #print(f"[INFO] Launching Chrome to open hashtag page: {url}")
-    driver = webdriver.Chrome(options=options)
-    driver.get(url)
-    print("[INFO] Waiting for user to be logged in (if needed).")
+    options.add_argument(f"user-data-dir={CHROME_USER_DATA_DIR}")
+    options.add_argument(f"--profile-directory={CHROME_PROFILE_DIRECTORY}")
+    return webdriver.Chrome(options=options)
 
-    # If user is not logged in, manually log in
+def wait_for_login(driver):
+    """If the browser is on the login page, block until the user logs in manually."""
     while "accounts/login" in driver.current_url:
-        print("[INFO] Login page detected, please log in manually in the opened browser.")
+        logger.warning("Login page detected, please log in manually in the opened browser.")
         input("[PROMPT] After logging in, press Enter here to continue...")
         time.sleep(3)
 
+POST_LINKS_JS = "return Array.from(document.querySelectorAll(\"a[href*='/p/']\"), a => a.href);"
+PAGE_STATE_JS = (
+    "const links = document.querySelectorAll(\"a[href*='/p/']\");"
+    "return [document.body.scrollHeight, links.length,"
+    " links.length ? links[links.length - 1].href : null];"
+)
+
+def _collect_new_post_urls(driver, post_urls: dict) -> int:
+    """
+    Read every post link on the page in one script call and add unseen base
+    post URLs to `post_urls` (an insertion-ordered dict). Returns how many were new.
+    """
+    before = len(post_urls)
+    for href in driver.execute_script(POST_LINKS_JS) or []:
+        if href and "/p/" in href and "liked_by" not in href and "comments" not in href:
+            post_urls.setdefault(get_post_url(get_shortcode(href)), None)
+    return len(post_urls) - before
+
+def get_hashtag_posts(hashtag: str, scroll_times=None, target_posts: int = None,
+                      scroll_timeout: float = 10, driver=None):
+    """
+    Use Selenium to open the hashtag page and scroll until `target_posts`
+    distinct post URLs are collected, a scroll loads no new links, or
+    `scroll_times` scrolls were made. After each scroll we wait for the
+    page to grow or show new links (up to `scroll_timeout` seconds) rather
+    than sleeping a fixed time. Without a target, scrolls `scroll_times`
+    (default 2) times like before.
+    Pass an existing `driver` (e.g. from session.BrowserSession) to reuse a
+    running browser; otherwise one is launched and closed here.
+    """
+    if scroll_times is None and target_posts is None:
+        scroll_times = 2
+    encoded_hashtag = quote(hashtag)
+    url = f"https://www.instagram.com/explore/tags/{encoded_hashtag}/"
+
+    owns_driver = driver is None
+    if owns_driver:
+        driver = launch_chrome()
+    start = time.perf_counter()
+    try:
+        return _scroll_hashtag_page(driver, url, scroll_times, target_posts, scroll_timeout)
+    finally:
+        # The whole page load + scrolling counts as one "selenium" call of the stage
+        get_stage(HASHTAG_POSTS).observe(time.perf_counter() - start, "selenium")
+        if owns_driver:
+            driver.quit()
+
+def _scroll_hashtag_page(driver, url: str, scroll_times, target_posts, scroll_timeout) -> list:
+    driver.get(url)
+    logger.debug("Waiting for user to be logged in (if needed).")
+    wait_for_login(driver)
+
     # Wait until at least one post link is found
     try:
-        print("[INFO] Waiting up to 60s for the first post to appear...")
+        logger.debug("Waiting up to 60s for the first post to appear...")
         WebDriverWait(driver, 60).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, "a[href*='/p/']"))
         )
-        print("[INFO] Found at least one post link.")
+        logger.debug("Found at least one post link.")
     except Exception as e:
-        print("Hashtag page timed out or structure unexpected:", e)
-        driver.quit()
+        logger.error("Hashtag page timed out or structure unexpected: %s", e)
         return []
 
-    # Scroll down to load more posts
-    print(f"[INFO] Scrolling the page {scroll_times} times to load more posts.")
-    for i in range(scroll_times):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        print(f"[INFO] Scroll iteration {i+1} completed.")
-        time.sleep(3)
-
-    # Collect distinct post URLs
-    print("[INFO] Collecting post URLs from the page.")
-    post_elements = driver.find_elements(By.CSS_SELECTOR, "a[href*='/p/']")
-    post_urls = set()
-    for elem in post_elements:
-        href = elem.get_attribute("href")
-        if href and "/p/" in href and "liked_by" not in href and "comments" not in href:
-            shortcode = href.split("/p/")[-1].split("/")[0]
-            base_url = f"https://www.instagram.com/p/{shortcode}/"
-            post_urls.add(base_url)
-
-    driver.quit()
-    print(f"[INFO] Total distinct post URLs found: {len(post_urls)}")
-    return list(post_urls)
-
+    post_urls = {}  # insertion-ordered set of base post URLs
+    _collect_new_post_urls(driver, post_urls)
 
-def get_cookies_from_driver():
+    # Scroll down until we have enough posts or the page stops growing
+    scrolls = 0
+    while target_posts is None or len(post_urls) < target_posts:
+        if scroll_times is not None and scrolls >= scroll_times:
+            break
+        # The grid recycles link elements, so watch the page height and last link
+        before = driver.execute_script(PAGE_STATE_JS)
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        scrolls += 1
+        try:
+            WebDriverWait(driver, scroll_timeout, poll_frequency=0.25).until(
+                lambda d: d.execute_script(PAGE_STATE_JS) != before
+            )
+        except Exception:
+            pass
+        new_count = _collect_new_post_urls(driver, post_urls)
+        logger.debug("Scroll %d: %d new post URLs (%d total).", scrolls, new_count, len(post_urls))
+        if new_count == 0:
+            logger.debug("No new posts loaded, stopping scroll.")
+            break
+
+    result = list(post_urls)
+    if target_posts is not None:
+        result = result[:target_posts]
+    logger.info("Total distinct post URLs found: %d", len(result))
+    return result
+
+
+def get_cookies_from_driver(driver=None):
     """
-    Spin up a Selenium session on instagram.com, allowing for manual login if needed,
-    then return the cookie dict for usage with httpx.
+    Open instagram.com in a Selenium session, allowing for manual login if needed,
+    then return the cookie dict for usage with httpx. Reuses `driver` if given.
     """
-    options = Options()
-    # options.add_argument("--headless")
-    options.add_argument("user-data-dir=/Users/xuhuirong/Library/Application Support/Google/Chrome")
-    options.add_argument("--profile-directory=Person 2")
-
-    print("[INFO] Launching Chrome to retrieve cookies.")
-    driver = webdriver.Chrome(options=options)
-    driver.get("https://www.instagram.com")
-    time.sleep(5)
-
-    while "accounts/login" in driver.current_url:
-        print("[INFO] Login page detected, please log in manually.")
-        input("[PROMPT] Press Enter after logging in...")
-        time.sleep(3)
+    owns_driver = driver is None
+    if owns_driver:
+        logger.info("Launching Chrome to retrieve cookies.")
+        driver = launch_chrome()
+    try:
+        driver.get("https://www.instagram.com")
+        time.sleep(5)
+        wait_for_login(driver)
+
+        selenium_cookies = driver.get_cookies()
+        cookie_dict = {}
+        for cookie in selenium_cookies:
+            cookie_dict[cookie["name"]] = cookie["value"]
+    finally:
+        if owns_driver:
+            driver.quit()
+
+    logger.info("Retrieved %d cookies.", len(cookie_dict))
+    return cookie_dict
 
-    selenium_cookies = driver.get_cookies()
-    cookie_dict = {}
-    for cookie in selenium_cookies:
-        cookie_dict[cookie["name"]] = cookie["value"]
+# ---------------------------
+# HTTP-based Hashtag Discovery
+# ---------------------------
 
-    driver.quit()
-    print(f"[INFO] Retrieved {len(cookie_dict)} cookies.")
-    return cookie_dict
+def iter_hashtag_media(hashtag: str, client: httpx.Client, tab: str = "recent"):
+    """
+    Page through the hashtag feed via the tag sections JSON endpoint and yield
+    a FeedPost (shortcode, taken_at, comment_count) per post in feed order.
+    Needs a client holding logged-in cookies but no browser. Pages are paced by the "tags"
+    rate governor.
+    """
+    url = HASHTAG_SECTIONS_URL.format(hashtag=quote(hashtag))
+    form = {"tab": tab, "include_persistent": "0"}
+    governor = get_governor(TAGS)
+    metrics = get_stage(HASHTAG_POSTS)
+    while True:
+        try:
+            data = _request_with_retries(
+                lambda: client.post(url, headers=get_profile_headers(), data=form, timeout=30.0),
+                loads, governor, metrics, f"#{hashtag} feed"
+            )
+        except FetchError as e:
+            logger.error("Could not fetch hashtag feed for #%s: %s", hashtag, e)
+            return
+
+        for section in data.get("sections", []):
+            for item in section.get("layout_content", {}).get("medias", []):
+                media = item.get("media", {})
+                if media.get("code"):
+                    yield FeedPost(media["code"], media.get("taken_at") or 0, media.get("comment_count"))
+
+        if not data.get("more_available") or not data.get("next_max_id"):
+            return
+        form["max_id"] = data["next_max_id"]
+        if data.get("next_page") is not None:
+            form["page"] = str(data["next_page"])
+        if data.get("next_media_ids"):
+            form["next_media_ids"] = json.dumps(data["next_media_ids"])
 
 # ---------------------------
 # Post & Comment Scraping
 # ---------------------------
 
-def scrape_post(url_or_shortcode: str, cookies: dict) -> dict:
+class FetchError(Exception):
+    """A request that still failed after every attempt."""
+
+
+def _request_with_retries(send, decode, governor, metrics, what: str, retries: int = REQUEST_RETRIES):
+    """
+    Call `send()` up to `retries` times until it returns a 200 reply that
+    `decode(content)` accepts, and return the decoded reply. Each attempt
+    waits for `governor` and reports the reply back to it, so 429/5xx
+    replies back off before the next attempt. Raises FetchError.
+    """
+    for attempt in range(retries):
+        if attempt:
+            metrics.retry()
+        metrics.slept(governor.wait())
+        start = time.perf_counter()
+        try:
+            logger.debug("Attempt %d: %s", attempt + 1, what)
+            response = send()
+        except httpx.HTTPError as e:
+            metrics.error(time.perf_counter() - start)
+            governor.record_error()
+            logger.warning("[%s] Request failed (attempt %d): %s", what, attempt + 1, e)
+            continue
+        metrics.observe(time.perf_counter() - start, response.status_code, len(response.content))
+        governor.record(response.status_code, response.headers.get("Retry-After"))
+        logger.debug("Received status code: %d (%d bytes)", response.status_code, len(response.content))
+        if response.status_code != 200:
+            logger.warning("[%s] Non-200 status code: %d", what, response.status_code)
+            continue
+        try:
+            return decode(response.content)
+        except Exception as e:
+            logger.error("[%s] Could not parse reply (attempt %d): %s", what, attempt + 1, e)
+    raise FetchError(f"{what}: no usable reply after {retries} attempts")
+
+def _post_graphql(shortcode: str, first: int, after: str, client: httpx.Client, decode):
+    """One page of a post's GraphQL query, retried and paced by the "graphql" governor."""
+    body = build_post_query(shortcode, first=first, after=after)
+    return _request_with_retries(
+        lambda: client.post(
+            url=INSTAGRAM_GRAPHQL_URL,
+            headers=get_graphql_headers(),
+            content=body,
+            timeout=60.0
+        ),
+        decode, get_governor(GRAPHQL), get_stage(SCRAPE_POST), f"post {shortcode} (after={after})"
+    )
+
+def scrape_post(url_or_shortcode: str, first: int = 50, after: str = None,
+                client: httpx.Client = None) -> dict:
     """
     Calls Instagram GraphQL to retrieve JSON about the post (including comments).
+    `first` and `after` select one page of comments; see iter_comments for paging.
+    Uses the shared pooled client unless `client` is given; the login
+    cookies are the client's (create_client(cookies=...) or client.cookies).
+    Returns {} if every attempt failed.
     """
-    if "http" in url_or_shortcode:
-        shortcode = url_or_shortcode.split("/p/")[-1].split("/")[0]
-    else:
-        shortcode = url_or_shortcode
+    client = client or get_shared_client()
+    shortcode = get_shortcode(url_or_shortcode)
+    try:
+        return _post_graphql(shortcode, first, after, client,
+                             lambda content: loads(content)["data"]["shortcode_media"])
+    except FetchError as e:
+        logger.error("Could not scrape post %s: %s", shortcode, e)
+        return {}
+
+def fetch_comment_page(url_or_shortcode: str, first: int = 50, after: str = None,
+                       client: httpx.Client = None) -> CommentPage:
+    """
+    Like scrape_post, but decodes the reply straight into a CommentPage
+    (decoding.py), skipping the parts of the post JSON that are not needed.
+    Raises FetchError if every attempt failed, so a failed page is never
+    mistaken for the end of the comments.
+    """
+    client = client or get_shared_client()
+    return _post_graphql(get_shortcode(url_or_shortcode), first, after, client, decode_comment_page)
 
-    print(f"[INFO] Scraping post shortcode: {shortcode}")
+def iter_comments(url_or_shortcode: str, page_size: int = 50,
+                  max_comments: int = None, client: httpx.Client = None,
+                  delta: CommentDelta = None):
+    """
+    Yield the Comment records of a post page by page, following the page
+    cursor. Only one page is held at a time, so large posts stream in
+    constant memory. Stops after `max_comments` comments if given.
+    Page requests are paced by the "graphql" rate governor.
+
+    With a CommentDelta (revisit of a post), paging starts where the last
+    visit ended, only comments newer than it are yielded and paging stops
+    as soon as the rest is known; delta.state() is the state to save.
+    Raises FetchError if a page could not be fetched.
+    """
+    after = delta.resume_from if delta else None
+    count = 0
+    while True:
+        page = fetch_comment_page(url_or_shortcode, first=page_size, after=after, client=client)
+        if delta is not None and delta.cursor_rejected(after, page):
+            logger.warning("Saved comment cursor for %s was rejected, starting over.", url_or_shortcode)
+            delta.restart()
+            after = None
+            continue
+        more = delta.observe_page(after, page) if delta is not None else True
+        for comment in page.comments:
+            if delta is not None:
+                if not delta.is_new(comment):
+                    continue
+                delta.seen(comment)
+            yield comment
+            count += 1
+            if max_comments is not None and count >= max_comments:
+                return
+        after = page.end_cursor
+        if after is None or not more:
+            return
+
+class UniqueUsernames:
+    """
+    Order-preserving set of usernames. Membership is a dict lookup, so
+    deduplicating n commenters is O(n) instead of the O(n^2) of checking a
+    list; one instance can be fed page after page, or post after post, to
+    deduplicate a whole stream.
+    """
 
-    variables = json.dumps({
-        "shortcode": shortcode,
-        "first": 50,  # how many comments to retrieve
-        "after": None
-    }, separators=(',', ':'))
+    def __init__(self, usernames=()):
+        self._seen = dict.fromkeys(usernames)
 
-    body = f"query_hash={INSTAGRAM_QUERY_HASH}&variables={quote(variables)}"
-    graphql_url = "https://www.instagram.com/graphql/query"
+    def add(self, username: str) -> bool:
+        """Add `username`; return True if it was not seen before."""
+        if not username or username in self._seen:
+            return False
+        self._seen[username] = None
+        return True
 
-    headers = {
-        "content-type": "application/x-www-form-urlencoded",
-        "User-Agent": get_random_user_agent()
-    }
+    def update(self, comments) -> list:
+        """Add the commenters of `comments`; return the new usernames in order."""
+        return [comment.username for comment in comments if self.add(comment.username)]
 
-    try:
-        response = httpx.post(
-            url=graphql_url,
-            headers=headers,
-            data=body,
-            cookies=cookies,
-            timeout=60.0
-        )
-        print(f"[INFO] Received status code: {response.status_code}")
-        # For debug, you could show part of the response text, but it's often large:
-        # print("Response text:", response.text)
+    def __contains__(self, username: str) -> bool:
+        return username in self._seen
 
-        data = response.json()
-        return data["data"]["shortcode_media"]
-    except Exception as e:
-        print(f"[ERROR] Could not parse JSON for post {shortcode}: {e}")
-        return {}
+    def __iter__(self):
+        return iter(self._seen)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+def collect_comment_usernames(comments, seen: UniqueUsernames = None) -> list:
+    """
+    Return the distinct commenter usernames from an iterable of Comment
+    records, in order of first appearance. With a shared `seen`, usernames
+    already in it (e.g. from earlier posts) are left out as well.
+    """
+    return (seen if seen is not None else UniqueUsernames()).update(comments)
 
 def extract_comment_usernames(post_json: dict) -> list:
     """
     Extracts commenters' usernames from a post's JSON data.
     """
-    usernames = []
-    comment_data = None
-    if "edge_media_to_parent_comment" in post_json:
-        comment_data = post_json["edge_media_to_parent_comment"]
-    elif "edge_media_to_comment" in post_json:
-        comment_data = post_json["edge_media_to_comment"]
-
-    if comment_data:
-        for edge in comment_data.get("edges", []):
-            node = edge.get("node", {})
-            owner = node.get("owner", {})
-            username = owner.get("username")
-            if username and username not in usernames:
-                usernames.append(username)
-
-    print(f"[INFO] Found {len(usernames)} unique commenter usernames in post data.")
+    usernames = collect_comment_usernames(comment_page_from_media(post_json).comments)
+
+    logger.debug("Found %d unique commenter usernames in post data.", len(usernames))
     return usernames
 
 # ---------------------------
 # Profile Scraping
 # ---------------------------
 
-def get_user_profile(username: str, client: httpx.Client, cookies: dict = None) -> dict:
+def get_user_profile(username: str, client: httpx.Client) -> Profile:
     """
     Calls the Instagram web_profile_info endpoint to get user biography, etc.
+    Returns a compact Profile (see profiles.py), or None if every attempt failed.
+    Attempts are paced by the "profile" rate governor, which also backs off
+    after 429/5xx replies.
     """
-    url = f"https://i.instagram.com/api/v1/users/web_profile_info/?username={username}"
-    headers = {
-        "User-Agent": get_random_user_agent(),
-        "x-ig-app-id": "936619743392459",
-        "Accept": "application/json",
-        "Referer": "https://www.instagram.com/"
-    }
-    retries = 3
-    for attempt in range(retries):
-        try:
-            print(f"[INFO] Attempt {attempt+1}: Fetching profile for user '{username}'")
-            response = client.get(url, headers=headers, cookies=cookies, timeout=30.0)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("data", {}).get("user", {})
-            else:
-                print(f"[WARN] [{username}] Non-200 status code: {response.status_code}")
-        except Exception as e:
-            print(f"[ERROR] [{username}] Error fetching info (attempt {attempt + 1}): {e}")
-        sleep_time = 2 + random.random() * 2
-        print(f"[INFO] Waiting {sleep_time:.1f} seconds before retrying user {username}...")
-        time.sleep(sleep_time)
-    return {}
+    url = PROFILE_INFO_URL.format(username=username)
+    try:
+        return _request_with_retries(
+            lambda: client.get(url, headers=get_profile_headers(), timeout=30.0),
+            lambda content: decode_profile(content, username),
+            get_governor(PROFILE), get_stage(USER_PROFILE), f"profile {username}"
+        )
+    except FetchError as e:
+        logger.warning("Could not fetch profile: %s", e)
+        return None
 
 def extract_phone_from_bio(bio: str) -> str:
-    phone_pattern = re.compile(r'(\+?\d[\d\s\-]{8,}\d)')
-    matches = phone_pattern.findall(bio)
+    matches = PHONE_PATTERN.findall(bio)
     return matches[0] if matches else ""
 
 def extract_email_from_bio(bio: str) -> str:
-    email_pattern = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
-    matches = email_pattern.findall(bio)
+    matches = EMAIL_PATTERN.findall(bio)
     return matches[0] if matches else ""
 
 def extract_link_from_bio(bio: str) -> str:
-    link_pattern = re.compile(r'https?://[^\s]+')
-    matches = link_pattern.findall(bio)
+    matches = LINK_PATTERN.findall(bio)
     return matches[0] if matches else ""